@@ -0,0 +1,197 @@
+'''
+api.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a client for harvesting newspaper articles through the Trove API.
+
+Each request returns up to 100 full article records, including their text,
+so there's no need to make a separate request for every article. Records
+are converted into the same fields used by the CSV harvester.
+
+USAGE:
+
+client = api.TroveApiClient()
+params = api.make_api_params('http://trove.nla.gov.au/newspaper/result?exactPhrase=inclement+wragge')
+total, records = client.search(params)
+articles = [api.record_to_article(record) for record in records]
+
+List the results without their text (eg. to check their correction counts),
+then get a single article:
+total, records = client.search(params, text=False)
+article = api.record_to_article(client.get_article(records[0]['id']))
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+import calendar
+import datetime
+import re
+import urllib
+import urlparse
+try:
+    from urlparse import parse_qsl
+except ImportError:
+# fall back for Python 2.5
+    from cgi import parse_qsl
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import fetch
+import retry
+from records import Article
+from utilities import format_date
+from scrape import IMAGE_PATH
+
+TROVE_KEY = 'ei4napgems7bf1bo'
+TROVE_API_URL = 'http://api.trove.nla.gov.au/result?zone=newspaper'
+TROVE_ARTICLE_URL = 'http://api.trove.nla.gov.au/newspaper/%s?%s'
+PAGE_SIZE = 100
+
+class TroveApiClient:
+    '''
+    Retrieves pages of full article records from the Trove API.
+    '''
+    def __init__(self, key=TROVE_KEY, tries=10):
+        self.key = key
+        self.tries = tries
+
+    def make_url(self, params, start=0, n=PAGE_SIZE, text=True):
+        params = list(params) + [('encoding', 'json'), ('key', self.key), ('reclevel', 'full')]
+        if text:
+            params.append(('include', 'articletext'))
+        params.extend([('n', n), ('s', start)])
+        return '%s&%s' % (TROVE_API_URL, urllib.urlencode(params))
+
+    def search(self, params, start=0, n=PAGE_SIZE, text=True):
+        '''
+        Retrieve a page of results (without the text of the articles if text is False).
+        Returns a tuple -- (total number of results, list of article records).
+        '''
+        url = self.make_url(params, start, n, text)
+        response = retry.RetryPolicy(tries=self.tries).call(fetch.get_url, url)
+        results = json.load(response)
+        records = results['response']['zone'][0]['records']
+        total = int(records['total'])
+        articles = records.get('article', [])
+        return (total, articles)
+
+    def get_article(self, article_id):
+        '''
+        Retrieve the full record of a single article, including its text.
+        '''
+        params = [('encoding', 'json'), ('key', self.key), ('reclevel', 'full'), 
+                  ('include', 'articletext')]
+        url = TROVE_ARTICLE_URL % (article_id, urllib.urlencode(params))
+        response = retry.RetryPolicy(tries=self.tries).call(fetch.get_url, url)
+        return json.load(response)['article']
+
+def make_api_params(query):
+    '''
+    Convert the url of a Trove newspapers search into a list of API parameters.
+    Keywords, titles, categories, dates, illustrations and sort order are
+    carried across.
+    '''
+    q_params = parse_qsl(urlparse.urlsplit(query)[3])
+    values = {}
+    for key, value in q_params:
+        values.setdefault(key, []).append(value)
+    keywords = []
+    if values.get('q', [''])[0]:
+        keywords.append(values['q'][0])
+    if values.get('exactPhrase', [''])[0]:
+        keywords.append('"%s"' % values['exactPhrase'][0])
+    if values.get('anyWords', [''])[0]:
+        keywords.append('(%s)' % ' OR '.join(values['anyWords'][0].split()))
+    if values.get('notWords', [''])[0]:
+        keywords.extend(['NOT %s' % word for word in values['notWords'][0].split()])
+    date_range = make_date_range(values)
+    if date_range:
+        keywords.append(date_range)
+    params = [('q', ' '.join(keywords))]
+    for title in values.get('l-title', []):
+        # Title ids are at the end of values like 'http://trove.nla.gov.au/ndp/del/title/35'
+        match = re.search(r'(\d+)$', title)
+        if match:
+            params.append(('l-title', match.group(1)))
+    for category in values.get('l-category', []):
+        params.append(('l-category', category.split('|')[0]))
+    if values.get('l-illustrated'):
+        params.append(('l-illustrated', 'true'))
+    if values.get('sortby', [''])[0]:
+        params.append(('sortby', values['sortby'][0]))
+    return params
+
+def make_date_range(values):
+    '''
+    Convert the from/to date parameters of a search url into an API date query.
+    '''
+    from_year = values.get('fromyyyy', [''])[0]
+    to_year = values.get('toyyyy', [''])[0]
+    if not from_year and not to_year:
+        return None
+    if from_year:
+        from_month = int(values.get('frommm', [''])[0] or 1)
+        from_day = int(values.get('fromdd', [''])[0] or 1)
+        start = '%s-%02d-%02dT00:00:00Z' % (from_year, from_month, from_day)
+    else:
+        start = '*'
+    if to_year:
+        to_month = int(values.get('tomm', [''])[0] or 12)
+        to_day = int(values.get('todd', [''])[0] or calendar.monthrange(int(to_year), to_month)[1])
+        end = '%s-%02d-%02dT00:00:00Z' % (to_year, to_month, to_day)
+    else:
+        end = '*'
+    return 'date:[%s TO %s]' % (start, end)
+
+def record_to_article(record):
+    '''
+    Convert an API article record into the fields produced by
+    TroveNewspapersClient.extract_article_details.
+    '''
+    article = Article()
+    article['id'] = record['id']
+    article['url'] = 'http://nla.gov.au/nla.news-article%s' % record['id']
+    article['title'] = record.get('heading', '').encode('utf-8')
+    newspaper = record['title']['value'].strip().replace(u'\xa0', ' ').replace(u'\u2013', '-')
+    match = re.search(r'(.*?)\s*\((.*?)\)', newspaper)
+    if match:
+        newspaper, details = match.groups()
+    else:
+        details = ''
+    article['newspaper_title'] = newspaper.encode('utf-8')
+    article['newspaper_details'] = details.encode('utf-8')
+    article['newspaper_id'] = record['title']['id']
+    year, month, day = (int(num) for num in record['date'].split('-'))
+    article['issue_date'] = format_date(datetime.date(year, month, day))
+    article['issue_year'], article['issue_month'], article['issue_day'] = year, month, day
+    article['page'] = record.get('page', '')
+    page_id = re.search(r'(\d*)$', record.get('trovePageUrl', '')).group(1)
+    article['page_url'] = 'http://nla.gov.au/nla.news-page' + page_id
+    article['tile_url'] = '%s%s/tile0-0-0' % (IMAGE_PATH, page_id)
+    article['thumb_url'] = '%s%s/thumb' % (IMAGE_PATH, page_id)
+    article['corrections'] = int(record.get('correctionCount', 0))
+    article.set_paras(extract_paras(record.get('articleText', '')))
+    return article
+
+def extract_paras(article_text):
+    '''
+    Split the html of an API record's articleText into paragraphs of text.
+    '''
+    return [re.sub(r'<[^>]+>', '', para).strip()
+            for para in re.findall(r'<p>(.*?)</p>', article_text, re.DOTALL)]
@@ -0,0 +1,305 @@
+'''
+archives.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a crash-safe archive of harvested files (article texts or pdfs),
+split across a series of zip files.
+
+A zip file's directory is only written when it's closed, so a harvest
+that's killed while adding to one big zip leaves it unreadable -- and the
+bigger it gets, the longer it takes to reopen. Instead, files are added to
+a shard that's sealed (closed and given its final name) once it holds
+max_files files or reaches max_bytes in size, and a new shard is started:
+
+    inclement_text_001.zip
+    inclement_text_002.zip
+    inclement_text_003.zip.part  <-- still being written
+
+After each file is added, a line is written to the archive's index --
+inclement_text_index.txt -- giving the article id, the shard number, the
+file's position in the shard, and its name. If the harvest is killed, the
+unsealed shard is recovered when the archive is reopened -- anything after
+the last indexed file is cut off, and the zip directory is rebuilt from
+the indexed files.
+
+Harvests started before archives were sharded saved everything in a
+single zip (eg. inclement_text.zip), which is left without a directory
+if the harvest is killed. repair_zip rebuilds it from the files that
+were completely written.
+
+USAGE:
+
+archive = archives.ShardedArchive('/home/wragge/inclement_text')
+archive.writestr(article_id, 'The-Argus/12324423.txt', text)
+archive.write(article_id, 'The-Argus/12324423.pdf', '/tmp/12324423.pdf')
+if article_id in archive:
+    ...
+archive.close()
+
+archives.repair_zip('/home/wragge/inclement_text.zip')
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import glob
+import os
+import re
+import struct
+import threading
+import zipfile
+from zipfile import ZipFile, ZipInfo
+
+import cache
+import journal
+
+# A shard is sealed once it reaches either of these limits
+MAX_BYTES = 256 * 1024 * 1024
+MAX_FILES = 10000
+# Suffix of the shard that's still being written
+PART_SUFFIX = '.part'
+# Flag bit set in a zip entry whose name is encoded as UTF-8
+UTF8_FLAG = 0x800
+
+class ShardedArchive:
+    '''
+    A series of zip files, each sealed when it's full, with an index
+    of the article ids they contain. Safe to use from multiple threads.
+    '''
+    def __init__(self, base, max_bytes=MAX_BYTES, max_files=MAX_FILES,
+                 compression=zipfile.ZIP_STORED):
+        self.base = base
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.zip_file = None
+        self.shard = 0
+        self.files = 0
+        self.index_path = '%s_index.txt' % base
+        self.index = journal.CompletedJournal(self.index_path)
+        self.shard = self.find_last_shard()
+        part = self.get_shard_path(self.shard) + PART_SUFFIX
+        if os.path.exists(part):
+            self.recover(part)
+
+    def __contains__(self, article_id):
+        return article_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def get_shard_path(self, number):
+        return '%s_%03d.zip' % (self.base, number)
+
+    def find_last_shard(self):
+        '''
+        Returns the number of the last shard, sealed or not (0 if there are none).
+        '''
+        pattern = re.compile(r'_(\d+)\.zip(%s)?$' % re.escape(PART_SUFFIX))
+        numbers = [0]
+        for path in glob.glob('%s_*.zip*' % self.base):
+            match = pattern.search(path)
+            if match and path[:match.start()] == self.base:
+                numbers.append(int(match.group(1)))
+        return max(numbers)
+
+    def writestr(self, article_id, name, data):
+        '''
+        Add a file with the given contents, unless the archive already holds
+        a file for this article. Returns True if the file was added.
+        '''
+        return self.add(article_id, name, lambda zip_file: zip_file.writestr(name, data))
+
+    def write(self, article_id, name, filename):
+        '''
+        Add a copy of the file at filename, unless the archive already holds
+        a file for this article. Returns True if the file was added.
+        '''
+        return self.add(article_id, name, lambda zip_file: zip_file.write(filename, name))
+
+    def add(self, article_id, name, write):
+        article_id = str(article_id)
+        with self.lock:
+            if article_id in self.index:
+                return False
+            if self.zip_file is None:
+                self.start_shard()
+            offset = self.zip_file.fp.tell()
+            write(self.zip_file)
+            # Make sure the file is saved before it's indexed
+            self.zip_file.fp.flush()
+            end = self.zip_file.fp.tell()
+            if isinstance(name, unicode):
+                name = name.encode('utf-8')
+            self.index.add(article_id, '%s\t%s\t%s\t%s' % (self.shard, offset, end, name))
+            self.files += 1
+            if end >= self.max_bytes or self.files >= self.max_files:
+                self.seal()
+        return True
+
+    def start_shard(self):
+        self.shard += 1
+        self.files = 0
+        part_file = open(self.get_shard_path(self.shard) + PART_SUFFIX, 'w+b')
+        self.zip_file = ZipFile(part_file, 'w', self.compression, allowZip64=True)
+
+    def seal(self):
+        '''
+        Write the directory of the current shard and give it its final name.
+        '''
+        part_file = self.zip_file.fp
+        self.zip_file.close()
+        part_file.flush()
+        os.fsync(part_file.fileno())
+        part_file.close()
+        path = self.get_shard_path(self.shard)
+        os.rename(path + PART_SUFFIX, path)
+        self.zip_file = None
+        self.index.sync()
+
+    def recover(self, part):
+        '''
+        Reopen a shard that was never sealed, keeping only the files in the index.
+        '''
+        members = []
+        lost = []
+        for article_id, note in self.index.ids.items():
+            fields = (note or '').split('\t', 3)
+            if len(fields) != 4:
+                # A line that was only partly written
+                lost.append(article_id)
+            elif int(fields[0]) == self.shard:
+                members.append((int(fields[1]), int(fields[2]), article_id))
+        members.sort()
+        part_file = open(part, 'r+b')
+        size = os.fstat(part_file.fileno()).st_size
+        infos = []
+        end = 0
+        for offset, member_end, article_id in members:
+            info = None
+            if offset == end and member_end <= size:
+                info = read_local_header(part_file, offset)
+            if info is None:
+                lost.append(article_id)
+            else:
+                infos.append(info)
+                end = member_end
+        if lost:
+            # Files that were indexed but never fully saved (eg. after a power cut)
+            self.rewrite_index(lost)
+        part_file.seek(end)
+        part_file.truncate()
+        self.zip_file = ZipFile(part_file, 'w', self.compression, allowZip64=True)
+        for info in infos:
+            self.zip_file.filelist.append(info)
+            self.zip_file.NameToInfo[info.filename] = info
+        self.files = len(infos)
+        print 'Recovered %s files from %s' % (len(infos), part)
+
+    def rewrite_index(self, lost):
+        '''
+        Remove the entries for some article ids from the index.
+        '''
+        self.index.close()
+        temp = '%s.tmp' % self.index_path
+        with open(self.index_path, 'rb') as index_file:
+            with open(temp, 'wb') as new_index_file:
+                for line in index_file:
+                    if line.split('\t', 1)[0] not in lost:
+                        new_index_file.write(line)
+        cache.replace_file(temp, self.index_path)
+        self.index = journal.CompletedJournal(self.index_path)
+
+    def close(self):
+        '''
+        Seal the current shard and close the index.
+        '''
+        with self.lock:
+            if self.zip_file is not None:
+                self.seal()
+            self.index.close()
+
+def repair_zip(path):
+    '''
+    Make a zip that was never closed readable again, by rebuilding its
+    directory from the files that were completely written -- eg. the single
+    _text.zip or _pdf.zip of a harvest that was killed before archives were
+    sharded. Returns the number of files kept, or None if the zip was
+    already readable.
+    '''
+    try:
+        ZipFile(path).close()
+        return None
+    except zipfile.BadZipfile:
+        pass
+    zip_fp = open(path, 'r+b')
+    size = os.fstat(zip_fp.fileno()).st_size
+    infos = []
+    end = 0
+    while True:
+        info = read_local_header(zip_fp, end)
+        # Entries whose sizes follow their data can't be walked
+        if info is None or info.flag_bits & 0x08:
+            break
+        member_end = zip_fp.tell() + info.compress_size
+        if member_end > size:
+            break
+        infos.append(info)
+        end = member_end
+    zip_fp.seek(end)
+    zip_fp.truncate()
+    zip_file = ZipFile(zip_fp, 'w', allowZip64=True)
+    for info in infos:
+        zip_file.filelist.append(info)
+        zip_file.NameToInfo[info.filename] = info
+    zip_file.close()
+    zip_fp.close()
+    return len(infos)
+
+def read_local_header(zip_fp, offset):
+    '''
+    Read the header of a zip entry at offset, returning a ZipInfo
+    (or None if there isn't a valid header there).
+    '''
+    zip_fp.seek(offset)
+    header = zip_fp.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader:
+        return None
+    (signature, extract_version, reserved, flag_bits, compress_type, dos_time, dos_date,
+     crc, compress_size, file_size, name_length, extra_length) = struct.unpack(zipfile.structFileHeader,
+                                                                                header)
+    if signature != zipfile.stringFileHeader:
+        return None
+    name = zip_fp.read(name_length)
+    extra = zip_fp.read(extra_length)
+    if flag_bits & UTF8_FLAG:
+        name = name.decode('utf-8')
+    date_time = ((dos_date >> 9) + 1980, (dos_date >> 5) & 0xF, dos_date & 0x1F,
+                 dos_time >> 11, (dos_time >> 5) & 0x3F, (dos_time & 0x1F) * 2)
+    info = ZipInfo(name, date_time)
+    info.extract_version = extract_version
+    info.reserved = reserved
+    info.flag_bits = flag_bits
+    info.compress_type = compress_type
+    info.CRC = crc
+    info.compress_size = compress_size
+    info.file_size = file_size
+    info.extra = extra
+    info.header_offset = offset
+    info.external_attr = 0600 << 16
+    return info
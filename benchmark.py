@@ -0,0 +1,366 @@
+'''
+benchmark.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Measures the speed and memory use of the extractors in scrape.py
+over a corpus of saved Trove pages.
+
+    extract_results -- search result pages
+    extract_details -- each result on the search result pages
+                       (the pages are parsed before timing starts)
+    extract_article_details -- article pages
+    extract_page_articles -- newspaper pages, with all their articles
+                             (only works with a response cache corpus)
+
+The article pages are also parsed in full (the 'soup' backend) and with
+only the regions we need (the 'fast' backend, using parsers.ARTICLE_STRAINER),
+and the two are reported side by side.
+
+Each extractor is run in its own process, so that its peak memory
+can be measured. The corpus can be a set of html files, or a response
+cache directory. A cache corpus can be recorded from a list of urls --
+include search pages with '[coming soon]' results and truncated titles,
+and articles that are short, long and have many corrections.
+The corpus report shows how many of each there are.
+
+If no corpus is given, the saved pages in data/corpus are used, along with
+the response cache in data/corpus-cache (a recorded newspaper page and its
+articles, for extract_page_articles). Together these include each of the
+kinds of page above, so runs before and after a change can be compared
+without recording anything. If there are no pages for an extractor, a
+warning is printed and it isn't run.
+
+USAGE:
+
+Record a corpus:
+python benchmark.py --record /home/wragge/corpus [url] [url] ...
+
+Run the benchmarks on the saved pages in data/corpus and data/corpus-cache:
+python benchmark.py
+
+Run the benchmarks, saving the results:
+python benchmark.py -o before.json /home/wragge/corpus
+
+Run them again and compare:
+python benchmark.py -o after.json --compare before.json /home/wragge/corpus
+
+Options:
+
+    -o (or --output) [file in which to save the results as JSON]
+    -c (or --compare) [results file from an earlier run to compare with]
+    -p (or --parser) [parser backend to use, see parsers.py]
+    -r (or --repeat) [number of times to run over the corpus]
+    -e (or --extractor) [only run this extractor]
+    --record [cache directory in which to save the urls given as arguments]
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import datetime
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from BeautifulSoup import BeautifulSoup
+
+import fetch
+import parsers
+import scrape
+
+# The kind of page each extractor works on
+EXTRACTORS = [('extract_results', 'search'),
+              ('extract_details', 'search'),
+              ('extract_article_details', 'article'),
+              ('extract_page_articles', 'page')]
+KIND_NAMES = {'search': 'search result', 'article': 'article', 'page': 'newspaper'}
+# The article page parses compared -- (label, parser backend)
+ARTICLE_PARSES = [('full', 'soup'), ('strained', 'fast')]
+SHORT_ARTICLE = 100
+LONG_ARTICLE = 1000
+MANY_CORRECTIONS = 10
+TRUNCATED_TITLE_RE = re.compile(r'<em>[^<)]*\([^<)]*</em>')
+CACHE_CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'data', 'corpus-cache')
+
+def load_corpus(paths):
+    '''
+    Read the saved pages, and use the first cache directory (if any)
+    to serve any other pages the extractors ask for.
+    '''
+    for path in paths:
+        if os.path.isdir(path) and is_cache(path):
+            fetch.use_cache(path, offline=True)
+            break
+    return list(parsers.find_pages(paths, kinds=('search', 'article', 'page')))
+
+def is_cache(path):
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            if filename.endswith('.json'):
+                return True
+    return False
+
+def describe_corpus(corpus):
+    '''
+    Count the pages of each kind, and the special cases the
+    corpus should include.
+    '''
+    counts = {'search': 0, 'article': 0, 'page': 0,
+              'coming_soon': 0, 'truncated_titles': 0,
+              'short_articles': 0, 'long_articles': 0, 'many_corrections': 0}
+    for name, kind, url, html in corpus:
+        counts[kind] += 1
+        if kind == 'search':
+            if '[coming soon]' in html:
+                counts['coming_soon'] += 1
+            if TRUNCATED_TITLE_RE.search(html):
+                counts['truncated_titles'] += 1
+        elif kind == 'article':
+            try:
+                article = parsers.run_parser('soup', kind, html, url)[1][0]
+            except Exception:
+                continue
+            words = len(article['text'].split())
+            if words < SHORT_ARTICLE:
+                counts['short_articles'] += 1
+            elif words >= LONG_ARTICLE:
+                counts['long_articles'] += 1
+            if article['corrections'] >= MANY_CORRECTIONS:
+                counts['many_corrections'] += 1
+    return counts
+
+def run_extractor(extractor, corpus, parser=None, repeat=1):
+    '''
+    Time an extractor over all the pages of the right kind in the corpus.
+    Returns a dictionary of results.
+    '''
+    kind = dict(EXTRACTORS)[extractor]
+    pages = [(url, html) for name, page_kind, url, html in corpus if page_kind == kind]
+    client = scrape.TroveNewspapersClient(titles=False, parser=parser)
+    if extractor == 'extract_details':
+        # Parse the pages first so that only the extraction is timed
+        pages = [(url, BeautifulSoup(html).find('div', {'id': 'newspapers'}).findAll('dl'))
+                 for url, html in pages]
+    baseline_memory = get_peak_memory()
+    page_count = 0
+    article_count = 0
+    errors = 0
+    started = time.time()
+    for run in range(repeat):
+        for url, page in pages:
+            try:
+                article_count += extract(client, extractor, url, page)
+            except Exception:
+                errors += 1
+            page_count += 1
+    seconds = time.time() - started
+    return {'pages': page_count,
+            'articles': article_count,
+            'errors': errors,
+            'seconds': seconds,
+            'pages_per_sec': page_count / seconds if seconds else 0,
+            'articles_per_sec': article_count / seconds if seconds else 0,
+            'baseline_memory_kb': baseline_memory,
+            'peak_memory_kb': get_peak_memory()}
+
+def extract(client, extractor, url, page):
+    '''
+    Run an extractor on one page, returning the number of articles extracted.
+    '''
+    client.reset()
+    client.query = url
+    if extractor == 'extract_results':
+        client.response = page
+        client.extract_results()
+        return len(client.results)
+    elif extractor == 'extract_details':
+        for result in page:
+            client.extract_details(result)
+        return len(page)
+    elif extractor == 'extract_article_details':
+        client.response = page
+        client.extract_article_details()
+        return 1
+    elif extractor == 'extract_page_articles':
+        client.extract_page_articles(url)
+        return len(client.results)
+
+def get_peak_memory():
+    '''
+    Peak memory use of this process (in KB on Linux, bytes on a Mac).
+    '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_benchmarks(paths, parser=None, repeat=1, extractors=None):
+    '''
+    Run each extractor in a separate process.
+    '''
+    corpus = load_corpus(paths)
+    kinds = set([kind for name, kind, url, html in corpus])
+    results = {'created': datetime.datetime.now().isoformat(),
+               'python': sys.version.split()[0],
+               'parser': parser or parsers.DEFAULT_PARSER,
+               'repeat': repeat,
+               'corpus': describe_corpus(corpus),
+               'extractors': {}}
+    for extractor, kind in EXTRACTORS:
+        if extractors and extractor not in extractors:
+            continue
+        if kind not in kinds:
+            print 'Warning: there are no %s pages in the corpus, so %s is not timed' % (
+                  KIND_NAMES[kind], extractor)
+            continue
+        result = run_child(extractor, paths, parser, repeat)
+        if result is not None:
+            results['extractors'][extractor] = result
+    if 'article' in kinds and (not extractors or 'extract_article_details' in extractors):
+        results['article_parses'] = {}
+        for label, name in ARTICLE_PARSES:
+            result = run_child('extract_article_details', paths, name, repeat)
+            if result is not None:
+                result['tree_kb'] = measure_trees(corpus, name)
+                results['article_parses'][label] = result
+    return results
+
+def run_child(extractor, paths, parser=None, repeat=1):
+    '''
+    Run an extractor in a separate process, returning its results.
+    '''
+    handle, output = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        command = [sys.executable, os.path.abspath(__file__), '--run', extractor,
+                   '-r', str(repeat), '-o', output]
+        if parser:
+            command.extend(['-p', parser])
+        subprocess.call(command + list(paths))
+        with open(output, 'rb') as result_file:
+            return json.load(result_file)
+    except ValueError:
+        print 'Failed to run %s' % extractor
+    finally:
+        os.remove(output)
+
+def measure_trees(corpus, parser):
+    '''
+    The average size (in KB) of the parse trees of the article pages.
+    '''
+    sizes = [parsers.measure_tree(parser, kind, html)
+             for name, kind, url, html in corpus if kind == 'article']
+    return sum(sizes) / 1024.0 / len(sizes)
+
+def report(results, previous=None):
+    print 'Parser: %s, Python %s' % (results['parser'], results['python'])
+    print 'Corpus: %s' % ', '.join(['%s %s' % (count, name.replace('_', ' '))
+                                    for name, count in sorted(results['corpus'].items())])
+    for extractor, kind in EXTRACTORS:
+        if extractor not in results['extractors']:
+            continue
+        result = results['extractors'][extractor]
+        print '%s: %s pages, %.1f pages/sec, %.1f articles/sec, peak memory %s KB (%s errors)' % (
+              extractor, result['pages'], result['pages_per_sec'], result['articles_per_sec'],
+              result['peak_memory_kb'], result['errors'])
+        if previous and extractor in previous['extractors']:
+            old = previous['extractors'][extractor]
+            changes = []
+            for key in ['pages_per_sec', 'articles_per_sec', 'peak_memory_kb']:
+                if old[key]:
+                    changes.append('%s %+.1f%%' % (key, (result[key] - old[key]) * 100.0 / old[key]))
+            print '    compared with %s: %s' % (previous['created'], ', '.join(changes))
+    parses = results.get('article_parses', {})
+    if parses:
+        print 'article parses:'
+        for label, name in ARTICLE_PARSES:
+            if label in parses:
+                result = parses[label]
+                print '    %s (%s): %.1f pages/sec, tree %.0f KB per page, peak memory %s KB (%s errors)' % (
+                      label, name, result['pages_per_sec'], result['tree_kb'],
+                      result['peak_memory_kb'], result['errors'])
+        if 'full' in parses and 'strained' in parses and parses['full']['pages_per_sec']:
+            full = parses['full']
+            strained = parses['strained']
+            print '    strained saves %.0f KB per page, pages/sec %+.1f%%' % (
+                  full['tree_kb'] - strained['tree_kb'],
+                  (strained['pages_per_sec'] - full['pages_per_sec']) * 100.0 / full['pages_per_sec'])
+
+def record(directory, urls):
+    '''
+    Save pages to a cache directory so they can be used as a corpus.
+    The articles on newspaper pages are saved too.
+    '''
+    fetch.use_cache(directory)
+    client = scrape.TroveNewspapersClient(titles=False)
+    client.tries = 10
+    for url in urls:
+        print 'Recording %s' % url
+        if 'nla.news-page' in url:
+            client.extract_pages_articles([url])
+        else:
+            client.fetch_page(url)
+
+def main(argv):
+    usage = 'usage: %prog [options] [corpus directories or html files]'
+    parser = OptionParser(usage=usage)
+    parser.add_option('-o', '--output', dest='output', metavar='FILE',
+                      help='file in which to save the results as JSON')
+    parser.add_option('-c', '--compare', dest='compare', metavar='FILE',
+                      help='results file from an earlier run to compare with')
+    parser.add_option('-p', '--parser', dest='parser',
+                      help='parser backend to use')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int', default=1,
+                      help='number of times to run over the corpus')
+    parser.add_option('-e', '--extractor', dest='extractors', action='append',
+                      help='only run this extractor')
+    parser.add_option('--record', dest='record', metavar='DIRECTORY',
+                      help='cache directory in which to save the urls given as arguments')
+    # Used to run a single extractor in a child process
+    parser.add_option('--run', dest='run')
+    (options, args) = parser.parse_args(argv)
+    if options.record and not args:
+        print 'You need to supply some urls to record.'
+        sys.exit(2)
+    if not args:
+        args = [parsers.CORPUS_DIR, CACHE_CORPUS_DIR]
+    if options.record:
+        record(options.record, args)
+    elif options.run:
+        corpus = load_corpus(args)
+        result = run_extractor(options.run, corpus, options.parser, options.repeat)
+        with open(options.output, 'wb') as output:
+            json.dump(result, output)
+    else:
+        results = run_benchmarks(args, options.parser, options.repeat, options.extractors)
+        previous = None
+        if options.compare:
+            with open(options.compare, 'rb') as compare_file:
+                previous = json.load(compare_file)
+        report(results, previous)
+        if options.output:
+            with open(options.output, 'wb') as output:
+                json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
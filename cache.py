@@ -0,0 +1,225 @@
+'''
+cache.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a persistent on-disk cache for responses retrieved through fetch.py.
+
+Responses are stored under a hash of their url. Each class of url (as
+worked out by fetch.classify_url) has its own time-to-live, and once the
+cache grows beyond its size limit the least recently used responses are
+removed. In offline mode nothing is fetched -- a url that isn't in the
+cache raises CacheMiss.
+
+USAGE:
+
+Cache responses for the rest of this session:
+fetch.use_cache('/home/wragge/trove-cache')
+
+Work only from the cache:
+fetch.use_cache('/home/wragge/trove-cache', offline=True)
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import hashlib
+import httplib
+import os
+import threading
+import time
+from StringIO import StringIO
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+DAY = 24 * 60 * 60
+# Time-to-live in seconds for each class of url.
+# A ttl of 0 means responses of that class aren't cached.
+TTLS = {'search': 1 * DAY,
+        'article': 7 * DAY,
+        'pdf': 0,
+        'api': 1 * DAY,
+        'holdings': 7 * DAY,
+        'default': 7 * DAY}
+MAX_BYTES = 1024 * 1024 * 1024
+
+class ResponseCache:
+    '''
+    A size-limited, least-recently-used cache of responses on disk.
+    '''
+    def __init__(self, directory, max_bytes=MAX_BYTES, ttls=None, offline=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = dict(TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.size = sum(size for path, size, used in self.list_entries())
+
+    def get_path(self, url):
+        key = hashlib.sha1(url).hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url, url_class='default'):
+        '''
+        Return the cached response for a url, or None if there isn't a
+        fresh one. In offline mode, missing responses raise CacheMiss and
+        stale ones are returned anyway.
+        '''
+        # Imported here because fetch imports this module
+        from fetch import Response
+        path = self.get_path(url)
+        try:
+            with open('%s.json' % path, 'rb') as meta_file:
+                meta = json.load(meta_file)
+            with open('%s.body' % path, 'rb') as body_file:
+                content = body_file.read()
+        except (IOError, ValueError):
+            with self.lock:
+                self.counts['misses'] += 1
+            if self.offline:
+                raise CacheMiss(url)
+            return None
+        ttl = self.ttls.get(url_class, self.ttls['default'])
+        if not self.offline and time.time() - meta['fetched'] > ttl:
+            with self.lock:
+                self.counts['misses'] += 1
+            return None
+        # Touch the body so eviction knows it was used recently
+        try:
+            os.utime('%s.body' % path, None)
+        except OSError:
+            pass
+        with self.lock:
+            self.counts['hits'] += 1
+        headers = httplib.HTTPMessage(StringIO(meta['headers'].encode('latin-1')))
+        return Response(meta['final_url'], 200, 'OK', headers, content)
+
+    def put(self, url, response, url_class='default'):
+        '''
+        Save a successful response.
+        '''
+        if self.offline or response.code != 200:
+            return
+        if not self.ttls.get(url_class, self.ttls['default']):
+            return
+        path = self.get_path(url)
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Another thread got there first
+                pass
+        meta = {'url': url, 'final_url': response.geturl(), 'fetched': time.time(),
+                'headers': ''.join(response.headers.headers).decode('latin-1')}
+        old_size = self.get_size(path)
+        # Write to temporary files and rename so readers never see half a response
+        temp = '%s.%s.tmp' % (path, threading.currentThread().getName())
+        with open(temp, 'wb') as body_file:
+            body_file.write(response.content)
+        replace_file(temp, '%s.body' % path)
+        with open(temp, 'wb') as meta_file:
+            json.dump(meta, meta_file)
+        replace_file(temp, '%s.json' % path)
+        with self.lock:
+            self.counts['stored'] += 1
+            self.size += len(response.content) - old_size
+            over = self.size > self.max_bytes
+        if over:
+            self.evict()
+
+    def forget(self, url):
+        '''
+        Remove a response from the cache.
+        '''
+        path = self.get_path(url)
+        size = self.get_size(path)
+        for ext in ('json', 'body'):
+            try:
+                os.remove('%s.%s' % (path, ext))
+            except OSError:
+                pass
+        with self.lock:
+            self.size -= size
+
+    def evict(self):
+        '''
+        Remove the least recently used responses until the cache is
+        back under 90% of its size limit.
+        '''
+        with self.lock:
+            entries = sorted(self.list_entries(), key=lambda entry: entry[2])
+            target = self.max_bytes * 0.9
+            for path, size, used in entries:
+                if self.size <= target:
+                    break
+                for ext in ('json', 'body'):
+                    try:
+                        os.remove('%s.%s' % (path, ext))
+                    except OSError:
+                        pass
+                self.size -= size
+                self.counts['evicted'] += 1
+
+    def list_entries(self):
+        '''
+        Generate a (path, size, last used) tuple for each cached response.
+        '''
+        for subdir in os.listdir(self.directory):
+            subpath = os.path.join(self.directory, subdir)
+            if not os.path.isdir(subpath):
+                continue
+            for filename in os.listdir(subpath):
+                if filename.endswith('.body'):
+                    path = os.path.join(subpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield (path[:-5], stat.st_size, stat.st_mtime)
+
+    def get_size(self, path):
+        try:
+            return os.path.getsize('%s.body' % path)
+        except OSError:
+            return 0
+
+def replace_file(source, target):
+    '''
+    Rename source to target, replacing target if it's already there.
+    '''
+    try:
+        os.rename(source, target)
+    except OSError:
+        # On Windows a file can't be renamed over an existing one
+        try:
+            os.remove(target)
+        except OSError:
+            pass
+        os.rename(source, target)
+
+class CacheMiss(Exception):
+    '''
+    A url wasn't in the cache while working offline.
+    '''
+    pass
@@ -0,0 +1,139 @@
+'''
+client.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a Trove newspapers client for running many requests at once.
+
+SharedNewspapersClient wraps a single TroveNewspapersClient (with a single
+set of titles and a single parser). Its operations return their results
+rather than leaving them on the client, so it can be used from any number
+of threads. Requests can also be submitted to the client's own pool of worker
+threads, and collected later. Everything goes through the shared session in
+fetch.py, so the same keep-alive connections and rate limits are used no
+matter how many requests are waiting.
+
+Every operation returns its results and raises its errors. The operations
+that retrieve several articles (get_articles and extract_page_articles)
+raise the first error from any of their articles. To carry on past errors,
+submit the requests yourself and call each Future's wait method, which
+returns a (result, error) tuple instead of raising.
+
+USAGE:
+
+client = client.SharedNewspapersClient()
+result = client.search(exactPhrase='inclement wragge')
+print result.total, result.results
+article = client.get_article('12324423')
+result = client.get_random_articles(year='1880', kw_all='kelly')
+articles = client.extract_page_articles('http://nla.gov.au/nla.news-page6571434')
+
+Run requests in the background:
+futures = [client.submit(client.get_article, article_id) for article_id in ids]
+articles = [future.result() for future in futures]
+client.close()
+
+Collect the errors instead of raising them:
+futures = [client.submit(client.get_article, article_id) for article_id in ids]
+outcomes = [future.wait() for future in futures]
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import threading
+
+import scrape
+from workers import WorkerPool
+
+# Number of worker threads used to run submitted requests
+WORKERS = 8
+
+class SharedNewspapersClient:
+    '''
+    A thread-safe Trove newspapers client whose operations return their results.
+    '''
+    def __init__(self, titles=True, parser=None, tries=1, workers=WORKERS):
+        self.news = scrape.TroveNewspapersClient(titles=titles, parser=parser)
+        self.news.tries = tries
+        self.workers = workers
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def search(self, **kwargs):
+        '''
+        Retrieve a page of results, using the same parameters as
+        TroveNewspapersClient.search (or a url).
+        Returns a SearchResult.
+        '''
+        return self.news.search(**kwargs)
+
+    def get_random_articles(self, **kwargs):
+        '''
+        Retrieve a random set of results, using the same parameters as
+        TroveNewspapersClient.get_random_articles.
+        Returns a SearchResult.
+        '''
+        return self.news.get_random_articles(**kwargs)
+
+    def get_article(self, article_id):
+        '''
+        Returns the details of an article as an Article record (see records.py).
+        '''
+        return self.news.get_article(article_id)
+
+    def extract_page_articles(self, page_url, workers=1):
+        '''
+        Returns a list of the details of all the articles on a page (as
+        Article records), retrieving up to workers articles at the same time.
+        Raises the first error if any of the articles can't be retrieved.
+        '''
+        articles, error = self.news.extract_pages_articles([page_url], workers)[0]
+        if error:
+            raise error
+        return articles
+
+    def submit(self, operation, *args, **kwargs):
+        '''
+        Run one of this client's operations in the background.
+        Returns a Future -- call its result method to wait for the results.
+        '''
+        return self.get_pool().submit(operation, *args, **kwargs)
+
+    def get_articles(self, article_ids):
+        '''
+        Retrieve a list of articles in the background.
+        Returns a list of Article records in the same order as article_ids.
+        Raises the first error if any of the articles can't be retrieved.
+        '''
+        futures = [self.submit(self.get_article, article_id) for article_id in article_ids]
+        return [future.result() for future in futures]
+
+    def get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = WorkerPool(self.workers)
+            return self.pool
+
+    def close(self):
+        '''
+        Wait for any submitted requests to finish, then stop the workers.
+        '''
+        with self.lock:
+            pool = self.pool
+            self.pool = None
+        if pool is not None:
+            pool.close()
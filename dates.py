@@ -0,0 +1,102 @@
+'''
+dates.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Parses the issue dates used by Trove -- eg. 'Friday 27 October 1911'.
+
+There are only a limited number of distinct issue dates, so parsed
+dates are remembered rather than being worked out again for every
+result and article.
+
+USAGE:
+
+year, month, day = dates.parse_issue_date('Friday 27 October 1911')
+date = dates.parse_date('Friday 27 October 1911')
+date_string = dates.format_issue_date(date)
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+import datetime
+import re
+
+DATE_RE = re.compile(r'\w+ (\d{1,2}) (\w+) (\d{4})')
+MONTHS = {'january': 1, 'february': 2, 'march': 3, 'april': 4,
+          'may': 5, 'june': 6, 'july': 7, 'august': 8,
+          'september': 9, 'october': 10, 'november': 11, 'december': 12}
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Maximum number of parsed dates to remember
+CACHE_SIZE = 100000
+
+_cache = {}
+
+def parse_issue_date(date_string):
+    '''
+    Parse a date of the form Friday 27 October 1911.
+    Returns a tuple -- (year, month, day).
+    Raises ValueError if the string doesn't contain a valid date.
+
+    >>> parse_issue_date('Friday 27 October 1911')
+    (1911, 10, 27)
+    >>> parse_issue_date('Monday 3 january 1898 [Issue No.1234]')
+    (1898, 1, 3)
+    >>> parse_issue_date('Friday 30 February 1911')
+    Traceback (most recent call last):
+    ...
+    ValueError: day is out of range for month
+    '''
+    try:
+        return _cache[date_string]
+    except KeyError:
+        pass
+    match = DATE_RE.search(date_string)
+    if not match:
+        raise ValueError('Not an issue date: %s' % date_string)
+    day, month, year = match.groups()
+    try:
+        month = MONTHS[month.lower()]
+    except KeyError:
+        raise ValueError('Unknown month: %s' % month)
+    # Check that the day exists
+    date = datetime.date(int(year), month, int(day))
+    if len(_cache) >= CACHE_SIZE:
+        _cache.clear()
+    _cache[date_string] = (date.year, date.month, date.day)
+    return _cache[date_string]
+
+def parse_date(date_string):
+    '''
+    Parse a date of the form Friday 27 October 1911 into a datetime.date.
+
+    >>> parse_date('Friday 27 October 1911')
+    datetime.date(1911, 10, 27)
+    '''
+    return datetime.date(*parse_issue_date(date_string))
+
+def format_issue_date(date):
+    '''
+    Write a datetime.date in the form Friday 27 October 1911.
+
+    >>> format_issue_date(datetime.date(1911, 10, 27))
+    'Friday 27 October 1911'
+    '''
+    month = [name for name, number in MONTHS.items() if number == date.month][0]
+    return '%s %s %s %s' % (DAYS[date.weekday()], date.day, month.capitalize(), date.year)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
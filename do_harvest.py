@@ -13,6 +13,19 @@ It can be run from the command line with the following arguments:
     -t (or --text) Create a zip file containing the text of articles
     -p (or --pdf) Create a zip file containing pdfs of articles
     -s (or --start) The result number to start at.
+    -w (or --workers) The number of articles to retrieve at the same time.
+    -c (or --cache) A directory in which to cache downloaded pages.
+    -o (or --offline) Only use pages that are already in the cache.
+    -b (or --backend) Use 'api' to harvest from the Trove API rather than the web pages.
+    -k (or --key) Your Trove API key.
+    -n (or --shards) Split the search into date ranges and harvest this many at the same time.
+    --pdf-workers The number of pdfs to download at the same time.
+    --database Also save the articles in an SQLite database you can search.
+    --parquet Also save the articles in Parquet files for loading into dataframes.
+    --jsonl Also save the articles in a JSON Lines file compressed with 'gzip' or 'zstd' (or 'none').
+    --no-ftext Leave the text with paragraph tags out of the CSV and JSON Lines files.
+    --previous The CSV, JSON Lines or database file of an earlier harvest of the same search --
+               only articles that are new (or have been corrected) since then are harvested.
     
 If run without any command line arguments, the script will look in 
 config/harvest.ini for its configuration options.
@@ -20,8 +33,13 @@ config/harvest.ini for its configuration options.
 Depending on the supplied configuration options the script creates:
 
     * a CSV file containing the details of articles - [your filename]
-    * a zip containing the text contents of articles - [your filename]_text.zip
-    * a zip containing pdfs of articles - [your filename]_pdf.zip
+    * zips containing the text contents of articles - [your filename]_text_001.zip, 
+      [your filename]_text_002.zip...
+    * zips containing pdfs of articles - [your filename]_pdf_001.zip...
+    * an SQLite database of articles with a full-text index - [your filename].db
+    * Parquet files of articles - [your filename]_parquet/part-00001.parquet...
+    * a JSON Lines file of articles - [your filename].jsonl.gz (or .jsonl.zst)
+    * a list of the articles that have changed since a previous harvest - [your filename]_delta.txt
 
 Copyright (C) 2011 Tim Sherratt
 This file is part of the TroveNewspapers package.
@@ -43,7 +61,9 @@ import getopt
 import sys
 import ConfigParser
 
+import fetch
 import harvest
+import ratelimit
 
 CONFIG_FILE = 'config/harvest.ini'
 
@@ -53,7 +73,18 @@ def main(argv):
                                             'start': 0, 
                                             'include-text': 'no', 
                                             'zip-directory-structure': 'title',
-                                            'include-pdf': 'no'})
+                                            'include-pdf': 'no',
+                                            'workers': 1,
+                                            'cache-directory': '',
+                                            'backend': 'html',
+                                            'api-key': '',
+                                            'shards': 1,
+                                            'pdf-workers': 2,
+                                            'database': 'no',
+                                            'parquet': 'no',
+                                            'jsonl': '',
+                                            'include-ftext': 'yes',
+                                            'previous-harvest': ''})
     config.read(CONFIG_FILE)
     query = config.get('harvest', 'query')
     filename = config.get('harvest', 'filename')
@@ -61,10 +92,25 @@ def main(argv):
     text = config.getboolean('harvest', 'include-text')
     zip_dir = config.get('harvest', 'zip-directory-structure')
     pdf = config.getboolean('harvest', 'include-pdf')
+    workers = config.getint('harvest', 'workers')
+    cache_dir = config.get('harvest', 'cache-directory')
+    offline = False
+    backend = config.get('harvest', 'backend')
+    api_key = config.get('harvest', 'api-key')
+    shards = config.getint('harvest', 'shards')
+    pdf_workers = config.getint('harvest', 'pdf-workers')
+    database = config.getboolean('harvest', 'database')
+    parquet = config.getboolean('harvest', 'parquet')
+    jsonl = config.get('harvest', 'jsonl')
+    ftext = config.getboolean('harvest', 'include-ftext')
+    previous = config.get('harvest', 'previous-harvest')
+    ratelimit.load_config(config, fetch.get_session().limiter)
     # Look to see if there were any config values in the command line
     try:
-        opts, args = getopt.getopt(argv, "q:f:s:d:tp", 
-                                   ["query=", "filename=", "start=", "zipdir=", "text", "pdf"])
+        opts, args = getopt.getopt(argv, "q:f:s:d:w:c:b:k:n:tpo", 
+                                   ["query=", "filename=", "start=", "zipdir=", "workers=", 
+                                    "cache=", "backend=", "key=", "shards=", "pdf-workers=", 
+                                    "text", "pdf", "offline", "database", "parquet", "jsonl=", "no-ftext", "previous="])
     except getopt.GetoptError:                                
         sys.exit(2)
     for opt, arg in opts:
@@ -80,11 +126,41 @@ def main(argv):
             zip_dir = arg
         if opt in ('-p', '--pdf'):
             pdf = True
+        if opt in ('-w', '--workers'):
+            workers = arg
+        if opt in ('-c', '--cache'):
+            cache_dir = arg
+        if opt in ('-o', '--offline'):
+            offline = True
+        if opt in ('-b', '--backend'):
+            backend = arg
+        if opt in ('-k', '--key'):
+            api_key = arg
+        if opt in ('-n', '--shards'):
+            shards = arg
+        if opt == '--pdf-workers':
+            pdf_workers = arg
+        if opt == '--database':
+            database = True
+        if opt == '--parquet':
+            parquet = True
+        if opt == '--jsonl':
+            jsonl = arg
+        if opt == '--no-ftext':
+            ftext = False
+        if opt == '--previous':
+            previous = arg
     if not query:
         print 'A Trove Newspapers search url is required.'
         sys.exit(2)
+    if cache_dir:
+        fetch.use_cache(cache_dir, offline=offline)
     harvester = harvest.TroveNewspapersHarvester()
-    harvester.harvest(query, filename, start, text, pdf, zip_dir)
+    harvester.harvest(query, filename, start, text, pdf, zip_dir, workers=workers, 
+                      backend=backend, api_key=api_key, shards=shards, 
+                      pdf_workers=pdf_workers, database=database,
+                      parquet=parquet, jsonl=jsonl, ftext=ftext,
+                      previous=previous)
     
 if __name__ == "__main__":
     main(sys.argv[1:])
\ No newline at end of file
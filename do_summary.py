@@ -4,7 +4,6 @@ Created on 12/04/2011
 @author: tim
 '''
 from __future__ import with_statement
-import string
 import re
 import datetime
 try:
@@ -29,11 +28,9 @@ def summary_all(news):
         args = {}
         args['fromyyyy'] = str(year)
         args['toyyyy'] = str(year)
-        news.reset()
-        news.tries = 10
-        news.search(**args)
-        print news.query
-        total = int(string.replace(news.total_results, ',', ''))
+        result = news.search(tries=10, **args)
+        print result.query
+        total = result.total
         totals[year] = total
         print '%s: %s' % (year, total)
     total_list = [[year, total] for year, total in totals.items()]
@@ -51,10 +48,7 @@ def summary_by_state(news):
             args['fromyyyy'] = str(year)
             args['toyyyy'] = str(year)
             args['state'] = state
-            news.reset()
-            news.tries = 10
-            news.search(**args)
-            total = int(string.replace(news.total_results, ',', ''))
+            total = news.search(tries=10, **args).total
             totals[state][year] = total
             print '%s %s: %s' % (state, year, total)
     with open('%s/summary-totals-bystate-%s.js' % (DIRECTORY, datetime.datetime.now().strftime('%Y-%m-%d')), 'wb') as jsfile:
@@ -81,11 +75,9 @@ def summary_by_title(news):
                 args['fromyyyy'] = str(year)
                 args['toyyyy'] = str(year)
                 args['l_title'] = '|%s' % title['id']
-                news.reset()
-                news.tries = 10
-                news.search(**args)
-                print news.query
-                total = int(string.replace(news.total_results, ',', ''))
+                result = news.search(tries=10, **args)
+                print result.query
+                total = result.total
                 totals[title['id']][year] = total
                 print '%s %s: %s' % (name, year, total)
             if totals[title['id']]:
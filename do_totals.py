@@ -32,6 +32,8 @@ Options:
     -g (or --graph) [The name of an existing graph (html file) that you want to add 
                      this series to. Default is the series name.]
     -m (or --monthly) [Query at monthly intervals.]
+    -c (or --cache) [A directory in which to cache downloaded pages.]
+    -o (or --offline) [Only use pages that are already in the cache.]
 
 To display multiple series in a single graph, simply use the 'graph' option to specify the
 name of the html output file.
@@ -92,8 +94,6 @@ from __future__ import with_statement
 from optparse import OptionParser
 import getopt
 import sys
-import string
-import time
 import re
 import datetime
 import os
@@ -111,7 +111,9 @@ try:
 except ImportError:
     import simplejson as json
 
+import fetch
 import scrape
+from shards import remove_dates_from_query
 
 ARTICLE_TYPES = {'Advertising|category:Advertising': 'advertising',
                  'Article|category:Article': 'news',
@@ -138,6 +140,10 @@ def main(argv):
     parser.add_option('-g','--graph', dest='graph',
                       help='name of graph (html) file for display')
     parser.add_option('-m', '--monthly', action="store_true", dest="monthly")
+    parser.add_option('-c', '--cache', dest='cache_dir', metavar='DIRECTORY',
+                      help='directory in which to cache downloaded pages')
+    parser.add_option('-o', '--offline', action="store_true", dest="offline",
+                      help='only use pages that are already in the cache')
     (options, args) = parser.parse_args()
     if not args:
         # Exit if no query is supplied
@@ -171,6 +177,8 @@ def main(argv):
         graph_name = '%s.html' % (options.graph.lower().replace(' ', '_').replace('-', '_'))
     else:
         graph_name = '%s.html' % filename
+    if options.cache_dir:
+        fetch.use_cache(options.cache_dir, offline=options.offline)
     news = scrape.TroveNewspapersClient()
     # Look to see if a start year is set, otherwise start in 1803
     if re.search('&fromyyyy=(\d{4})', query):
@@ -213,7 +221,6 @@ def main(argv):
             else:
                 ratio = 0
             data[int(year)] = {'total': total, 'ratio': ratio}
-        time.sleep(1)
     # Write the data out to a js file
     if options.monthly:
         interval = 'month'
@@ -233,19 +240,13 @@ def main(argv):
     print data
 
 def get_total(news, this_query):
-    news.reset()
-    news.tries = 10
-    news.search(url=this_query)
     # Get the total results
-    total = int(string.replace(news.total_results, ',', ''))
+    total = news.search(url=this_query, tries=10).total
     print '    Query total: %s' % (total)
     return total
     
 def get_ratio(news, this_query, total):
-    news.reset()
-    news.tries = 10
-    news.search(url=this_query)
-    total_all = int(string.replace(news.total_results, ',', ''))
+    total_all = news.search(url=this_query, tries=10).total
     # Calculate the proportion
     ratio = float(total) / total_all
     print '    Article total: %s' % (total_all)
@@ -322,15 +323,5 @@ def remove_keywords_from_query(url):
     cleaned_url = urlparse.urlunparse((parts[0], parts[1], parts[2], parts[3], cleaned_query, parts[5]))
     return cleaned_url
 
-def remove_dates_from_query(query):
-    '''
-    Strip any existing date parameters from the query string.
-    '''
-    patterns = ['&fromdd=*\d{0,2}', '&frommm=*\d{0,2}', '&fromyyyy=*\d{0,4}',
-                '&todd=*\d{0,2}', '&tomm=*\d{0,2}', '&toyyyy=*\d{0,4}']
-    for pattern in patterns:
-        query = re.sub(pattern, '', query)
-    return query
-
 if __name__ == "__main__":
     main(sys.argv[1:])
@@ -11,7 +11,8 @@ from nltk.corpus import wordnet as wn
 import string
 
 import utilities
-from utilities import parse_date, format_date, find_duplicates, get_titles, clean_filename
+from dates import parse_date
+from utilities import format_date, find_duplicates, get_titles, clean_filename
 from harvest import TroveNewspapersHarvester
 from titles import get_titles_by_year
 from issues import get_title_issues
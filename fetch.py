@@ -0,0 +1,393 @@
+'''
+fetch.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a shared HTTP session used by all the Trove fetchers.
+
+Connections are kept alive and pooled per host, so the cost of opening
+a connection is paid once rather than once for every page, article and pdf.
+
+USAGE:
+
+response = fetch.get_url('http://nla.gov.au/nla.news-article12324423')
+content = response.read()
+
+Stream a large file to disk:
+with open('article.pdf', 'wb') as pdf_file:
+    fetch.download('http://trove.nla.gov.au/ndp/del/printArticlePdf/12324423/3?print=n', pdf_file)
+
+See how well the connections are being reused:
+print fetch.get_session().stats()
+
+Send every request to a local replay server instead of Trove (see replay.py):
+fetch.use_replay('http://localhost:8800')
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import httplib
+import os
+import re
+import socket
+import threading
+import urlparse
+from StringIO import StringIO
+from urllib2 import HTTPError, URLError
+
+import cache
+import ratelimit
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux i686; rv:2.0.1) Gecko/20100101 Firefox/4.0.1'
+MAX_CONNECTIONS_PER_HOST = 4
+MAX_REDIRECTS = 5
+TIMEOUT = 60
+CHUNK_SIZE = 64 * 1024
+REDIRECT_CODES = [301, 302, 303, 307]
+# If set, the shared session sends all its requests to this replay server
+REPLAY_ENV = 'TROVE_REPLAY'
+# If set as well, the rate limits are turned off
+REPLAY_UNLIMITED_ENV = 'TROVE_REPLAY_UNLIMITED'
+
+def classify_url(url):
+    '''
+    Work out which Trove endpoint a url belongs to.
+    Used to choose rate limits and cache lifetimes.
+    '''
+    if 'api.trove.nla.gov.au' in url:
+        return 'api'
+    elif 'printArticlePdf' in url:
+        return 'pdf'
+    elif 'nla.news-article' in url:
+        return 'article'
+    elif '/newspaper/result' in url:
+        return 'search'
+    elif re.search(r'/ndp/del/(titleList|yearsAndMonthsForTitle|titlesOverDates)', url):
+        return 'holdings'
+    else:
+        return 'default'
+
+class Response:
+    '''
+    A fully read response, with the same read/geturl/info methods
+    as the objects returned by urllib2.urlopen.
+    '''
+    def __init__(self, url, code, msg, headers, content):
+        self.url = url
+        self.code = code
+        self.msg = msg
+        self.headers = headers
+        self.content = content
+        self.fp = StringIO(content)
+
+    def read(self, size=-1):
+        return self.fp.read(size)
+
+    def readline(self):
+        return self.fp.readline()
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self.code
+
+    def info(self):
+        return self.headers
+
+    def close(self):
+        self.fp.close()
+
+class ConnectionPool:
+    '''
+    A pool of keep-alive connections to a single host.
+    '''
+    def __init__(self, scheme, host, maxsize=MAX_CONNECTIONS_PER_HOST, timeout=TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.timeout = timeout
+        self.idle = []
+        self.lock = threading.Lock()
+        # Limits the number of connections open to this host at any one time
+        self.slots = threading.BoundedSemaphore(maxsize)
+        self.counts = {'requests': 0, 'opened': 0, 'reused': 0, 'discarded': 0}
+
+    def get(self):
+        '''
+        Wait for a free slot, then return an idle connection or a new one.
+        Returns a tuple -- (connection, reused).
+        '''
+        self.slots.acquire()
+        with self.lock:
+            self.counts['requests'] += 1
+            if self.idle:
+                self.counts['reused'] += 1
+                return (self.idle.pop(), True)
+            self.counts['opened'] += 1
+        return (self.new_connection(), False)
+
+    def new_connection(self):
+        if self.scheme == 'https':
+            return httplib.HTTPSConnection(self.host, timeout=self.timeout)
+        else:
+            return httplib.HTTPConnection(self.host, timeout=self.timeout)
+
+    def put(self, conn):
+        '''
+        Return a connection to the pool so it can be reused.
+        '''
+        with self.lock:
+            self.idle.append(conn)
+        self.slots.release()
+
+    def discard(self, conn):
+        '''
+        Close a connection that can't be reused.
+        '''
+        conn.close()
+        with self.lock:
+            self.counts['discarded'] += 1
+        self.slots.release()
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle = []
+
+def redirect_error(response):
+    '''
+    The error raised when a response is still redirecting after MAX_REDIRECTS,
+    worded as urllib2 words it.
+    '''
+    msg = ('The HTTP server returned a redirect error that would lead to an infinite loop.\n'
+           'The last 30x error message was:\n%s' % response.msg)
+    return HTTPError(response.url, response.code, msg, response.headers, response.fp)
+
+class HTTPSession:
+    '''
+    Pooled keep-alive HTTP session shared by scrape, harvest and utilities.
+    Every request waits on the rate limiter for its endpoint.
+    If a response cache is set, responses are looked for there first.
+    If an origin is set, requests are sent there instead, with the original
+    scheme and host added to the start of the path (see replay.py).
+    Safe to use from multiple threads.
+    '''
+    def __init__(self, max_per_host=MAX_CONNECTIONS_PER_HOST, timeout=TIMEOUT, limiter=None,
+                 response_cache=None, origin=None):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        if limiter is None:
+            limiter = ratelimit.RateLimiter()
+        self.limiter = limiter
+        self.cache = response_cache
+        self.origin = origin
+        self.headers = {'User-Agent': USER_AGENT}
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def get_pool(self, scheme, host):
+        with self.lock:
+            try:
+                pool = self.pools[(scheme, host)]
+            except KeyError:
+                pool = ConnectionPool(scheme, host, self.max_per_host, self.timeout)
+                self.pools[(scheme, host)] = pool
+        return pool
+
+    def get(self, url, headers=None):
+        '''
+        Retrieve a url, following any redirects.
+        Raises HTTPError for error responses (or too many redirects) and
+        URLError if the server can't be reached, just like urllib2.urlopen.
+        Only successful responses are cached.
+        '''
+        # Redirects count against the limit for the original endpoint
+        endpoint = classify_url(url)
+        if self.cache is not None:
+            response = self.cache.get(url, endpoint)
+            if response is not None:
+                return response
+        original_url = url
+        for redirect in range(MAX_REDIRECTS + 1):
+            response = self.request(url, headers, endpoint)
+            if response.code in REDIRECT_CODES and response.headers.getheader('location'):
+                url = urlparse.urljoin(url, response.headers.getheader('location'))
+            else:
+                break
+        else:
+            raise redirect_error(response)
+        if response.code >= 400:
+            raise HTTPError(response.url, response.code, response.msg,
+                            response.headers, response.fp)
+        if self.cache is not None and response.code == 200:
+            self.cache.put(original_url, response, endpoint)
+        return response
+
+    def download(self, url, out, headers=None, chunk_size=CHUNK_SIZE):
+        '''
+        Retrieve a url, following any redirects, and write the body to the
+        file object out in chunks rather than reading it into memory.
+        Returns the response, with empty content. Downloads aren't cached.
+        '''
+        endpoint = classify_url(url)
+        for redirect in range(MAX_REDIRECTS + 1):
+            response = self.request(url, headers, endpoint, out, chunk_size)
+            if response.code in REDIRECT_CODES and response.headers.getheader('location'):
+                url = urlparse.urljoin(url, response.headers.getheader('location'))
+            else:
+                break
+        else:
+            raise redirect_error(response)
+        if response.code >= 400:
+            raise HTTPError(response.url, response.code, response.msg,
+                            response.headers, response.fp)
+        return response
+
+    def forget(self, url):
+        '''
+        Remove a url from the response cache (eg. if it was incomplete).
+        '''
+        if self.cache is not None:
+            self.cache.forget(url)
+
+    def request(self, url, headers=None, endpoint=None, out=None, chunk_size=CHUNK_SIZE):
+        '''
+        Make a single GET request using a pooled connection.
+        If a file object is given as out, the body of a successful
+        response is written to it in chunks.
+        '''
+        scheme, host, path, query, fragment = urlparse.urlsplit(url)
+        if query:
+            path = '%s?%s' % (path, query)
+        if not path:
+            path = '/'
+        if self.origin:
+            path = '/%s/%s%s' % (scheme, host, path)
+            scheme, host = urlparse.urlsplit(self.origin)[:2]
+        req_headers = dict(self.headers)
+        if headers:
+            req_headers.update(headers)
+        pool = self.get_pool(scheme, host)
+        if endpoint is None:
+            endpoint = classify_url(url)
+        self.limiter.acquire(endpoint)
+        while True:
+            conn, reused = pool.get()
+            try:
+                conn.request('GET', path, headers=req_headers)
+                response = conn.getresponse()
+                if out is not None and response.status == 200:
+                    content = ''
+                    copy_body(response, out, chunk_size)
+                else:
+                    content = response.read()
+            except (httplib.HTTPException, socket.error), error:
+                pool.discard(conn)
+                # The server may have closed an idle keep-alive connection,
+                # so try once more on a fresh one before giving up
+                if reused:
+                    continue
+                raise URLError(error)
+            except Exception:
+                pool.discard(conn)
+                raise
+            else:
+                if response.will_close:
+                    pool.discard(conn)
+                else:
+                    pool.put(conn)
+                return Response(url, response.status, response.reason,
+                                response.msg, content)
+
+    def stats(self):
+        '''
+        Return the request and connection counts for each host.
+        '''
+        with self.lock:
+            return dict(('%s://%s' % key, dict(pool.counts))
+                        for key, pool in self.pools.items())
+
+    def close(self):
+        with self.lock:
+            for pool in self.pools.values():
+                pool.close()
+
+def copy_body(response, out, chunk_size=CHUNK_SIZE):
+    '''
+    Write the body of an httplib response to a file object, a chunk at a time.
+    Anything already in the file (eg. from a failed attempt) is replaced.
+    '''
+    out.seek(0)
+    out.truncate()
+    while True:
+        chunk = response.read(chunk_size)
+        if not chunk:
+            break
+        out.write(chunk)
+    out.flush()
+
+class ServerError(Exception):
+    '''
+    The server failed to return a (complete) response.
+    '''
+    pass
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    '''
+    Return the shared session, creating it if necessary.
+    '''
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = HTTPSession(origin=os.environ.get(REPLAY_ENV))
+            if _session.origin and os.environ.get(REPLAY_UNLIMITED_ENV):
+                _session.limiter.enabled = False
+        return _session
+
+def get_url(url, headers=None):
+    '''
+    Retrieve a url using the shared session.
+    '''
+    return get_session().get(url, headers)
+
+def download(url, out, headers=None):
+    '''
+    Stream a url to a file object using the shared session.
+    '''
+    return get_session().download(url, out, headers)
+
+def use_cache(directory, offline=False, max_bytes=cache.MAX_BYTES):
+    '''
+    Cache responses retrieved through the shared session in the given directory.
+    In offline mode, responses come only from the cache.
+    '''
+    get_session().cache = cache.ResponseCache(directory, max_bytes=max_bytes, offline=offline)
+
+def use_replay(origin, unlimited=False):
+    '''
+    Send the requests made through the shared session to a replay server,
+    eg. 'http://localhost:8800'. If unlimited is True, the rate limits are
+    turned off.
+    '''
+    session = get_session()
+    session.origin = origin
+    if unlimited:
+        session.limiter.enabled = False
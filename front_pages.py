@@ -3,10 +3,10 @@ import datetime
 import os
 import re
 import json
-import time
 from BeautifulSoup import BeautifulSoup
 
 import scrape
+from api import TROVE_KEY, TROVE_API_URL
 from utilities import get_url, convert_iso_to_datetime
 from issues import get_issue_url, IssueError, MONTH_ISSUES_URL
 from titles import TITLES_URL, TITLE_HOLDINGS_URL
@@ -15,10 +15,10 @@ from urllib import quote_plus
 
 HARVEST_DIR = '/Users/tim/Documents/trove/'
 TROVE_URL = 'http://trove.nla.gov.au'
-TROVE_KEY = 'ei4napgems7bf1bo'
-TROVE_API_URL = 'http://api.trove.nla.gov.au/result?zone=newspaper'
 TROVE_TITLES_URL = 'http://api.trove.nla.gov.au/newspaper/titles/'
 TROVE_TITLE_URL = 'http://api.trove.nla.gov.au/newspaper/title/'
+# Number of front pages to extract articles from at the same time
+PAGE_BATCH_SIZE = 10
 
 
 def get_front_page_url(date, title_id):
@@ -70,10 +70,11 @@ def get_front_page_image(date, title_id, page_id=None, size='small'):
     else:
         return response.read()
     
-def harvest_front_pages_text(start, end, title_id):
+def harvest_front_pages_text(start, end, title_id, workers=4):
     '''
     Harvest and concatenate text content of all articles on front page.
     start and end are dates in ISO YYYY-MM-DD format, eg: '1857-02-04'
+    Up to workers articles are retrieved at the same time.
     
     >>> harvest_front_pages_text('1902-01-01','1902-01-01', '34')
     Checking date: 1902-01-01
@@ -86,6 +87,9 @@ def harvest_front_pages_text(start, end, title_id):
     end_date = convert_iso_to_datetime(end)
     one_day = datetime.timedelta(days=1)
     this_day = start_date
+    np = scrape.TroveNewspapersClient(titles=False)
+    np.tries = 10
+    pages = []
     # Loop through each day in specified period 
     while this_day <= end_date:
         print 'Checking date: %s' % this_day.isoformat()
@@ -97,17 +101,24 @@ def harvest_front_pages_text(start, end, title_id):
             page_id = get_front_page_id(None, None, page_url)
             filename = '%s%s-%s.txt' % (directory, this_day.isoformat(), page_id)
             if not os.path.exists(filename):
-                np = scrape.TroveNewspapersClient()
-                np.extract_page_articles(page_url)
-                articles = np.results
-                page_text = ''
-                for article in articles:
-                    page_text += article['text']
-                print 'Saving: %s' % os.path.basename(filename)
-                with open(filename, 'wb') as f:
-                    f.write(page_text)            
+                pages.append((page_url, filename))
         this_day += one_day
-        time.sleep(1) 
+        if len(pages) == PAGE_BATCH_SIZE or (pages and this_day > end_date):
+            save_pages_text(np, pages, workers)
+            pages = []
+
+def save_pages_text(np, pages, workers):
+    '''
+    Extract the articles from a batch of pages, saving the text of each page.
+    '''
+    results = np.extract_pages_articles([page_url for page_url, filename in pages], workers)
+    for (page_url, filename), (articles, error) in zip(pages, results):
+        if error:
+            raise error
+        page_text = ''.join([article['text'] for article in articles])
+        print 'Saving: %s' % os.path.basename(filename)
+        with open(filename, 'wb') as f:
+            f.write(page_text)
     
 def harvest_front_pages(start, end, title_id, size='small'):
     '''
@@ -142,7 +153,6 @@ def harvest_front_pages(start, end, title_id, size='small'):
                     with open(filename, 'wb') as f:
                         f.write(image)            
         this_day += one_day
-        time.sleep(1)
 
 def sample_front_pages(size='thumb'):
     '''
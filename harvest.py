@@ -36,13 +36,30 @@ along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses
 
 from __future__ import with_statement #for Python 2.5
 import csv
+import functools
 import os
 import time
 import string
-from zipfile import ZipFile
-from urllib2 import Request, urlopen, URLError, HTTPError
+import threading
+import Queue
+from urllib2 import HTTPError
 
+import api
+import archives
+import fetch
+import journal
+import retry
 import scrape
+import shards
+import sinks
+import workers
+from fetch import ServerError
+
+PDF_URL = 'http://trove.nla.gov.au/ndp/del/printArticlePdf/%s/3?print=n'
+# Maximum number of pdfs waiting to be downloaded
+PDF_QUEUE_SIZE = 1000
+# Number of articles written between checkpoints
+CHECKPOINT_EVERY = 100
     
 class TroveNewspapersHarvester:
     '''
@@ -69,11 +86,36 @@ class TroveNewspapersHarvester:
         self.csv_file = None
         self.text_zip_file = None
         self.pdf_zip_file = None
+        self.pdfs = None
+        self.pdf_workers = 2
+        # Places the details of articles are saved, starting with the CSV file (see sinks.py)
+        self.sinks = []
+        self.ftext = True
         self.zip_dir = ''
+        self.workers = 1
+        self.lookahead = 1
+        self.backend = 'html'
+        self.api_key = api.TROVE_KEY
+        self.shards = 1
+        # A single client is shared by the page prefetcher and the worker threads
+        self.news = scrape.TroveNewspapersClient(titles=False)
+        # Ids of articles already written, shared by shard harvesters
+        self.journal = None
+        # Ids of articles written since the last checkpoint, with their changes
+        self.pending = {}
+        # Correction counts of the articles in a previous harvest, keyed by id
+        self.previous = None
+        self.previous_path = None
+        # Ids of the results seen in an incremental harvest
+        self.seen = set()
+        # Journal of the articles that have changed since the previous harvest
+        self.delta = None
+        self.write_lock = threading.Lock()
     
-    def set_output_files(self, filename, text, pdf):
+    def set_output_files(self, filename, text, pdf, database=False, parquet=False, jsonl=None):
         '''
-        Prepare the output files for the CSV, zipped text and zipped pdf.
+        Prepare the output files for the CSV, zipped text and zipped pdf,
+        and the JSON Lines, SQLite database and Parquet files.
         '''
         if not filename:
             filename = os.path.join(os.path.dirname(__file__), 
@@ -83,160 +125,506 @@ class TroveNewspapersHarvester:
             self.path = filename[:string.rfind(filename, '.')]
         else:
             self.path = filename
-        self.csv_file = csv.DictWriter(open(filename, 'ab'), extrasaction='ignore', 
-                                       fieldnames=['id', 'title', 'url', 
-                                                   'newspaper_title', 'newspaper_details', 
-                                                   'newspaper_id', 'issue_date', 'page', 
-                                                   'page_url','corrections','ftext','text'], 
-                                                   dialect=csv.excel)
+        if self.previous_path is not None:
+            outputs = [filename, '%s.db' % self.path] + [self.path + extension for extension 
+                                                         in sinks.JSONL_EXTENSIONS.values()]
+            if os.path.abspath(self.previous_path) in [os.path.abspath(output) for output in outputs]:
+                raise ValueError('The previous harvest has to be saved in a different file: %s' % 
+                                 self.previous_path)
+        self.csv_file = sinks.CSVSink(filename, '%s_csv_checkpoint.txt' % self.path, self.ftext)
+        self.sinks.append(self.csv_file)
         print 'File created: %s' % filename
-        # the path.exists check is necessary for Python 2.5
+        self.journal = journal.CompletedJournal('%s_done.txt' % self.path)
+        if not self.journal.existed:
+            self.load_completed_ids()
+        # Texts and pdfs are saved in series of zips that are sealed when full
         if text: 
-            if os.path.exists('%s_text.zip' % self.path):
-                self.text_zip_file = ZipFile('%s_text.zip' % self.path, 'a')
-            else:
-                self.text_zip_file = ZipFile('%s_text.zip' % self.path, 'w')
-            print 'File created: %s_text.zip' % self.path
+            self.check_legacy_zip('%s_text.zip' % self.path)
+            self.text_zip_file = archives.ShardedArchive('%s_text' % self.path)
+            print 'Files created: %s_text_*.zip' % self.path
         if pdf:
-            if os.path.exists('%s_pdf.zip' % self.path):
-                self.pdf_zip_file = ZipFile('%s_pdf.zip' % self.path, 'a')
-            else:
-                self.pdf_zip_file = ZipFile('%s_pdf.zip' % self.path, 'w')
-            print 'File created: %s_pdf.zip' % self.path
+            self.check_legacy_zip('%s_pdf.zip' % self.path)
+            self.pdf_zip_file = archives.ShardedArchive('%s_pdf' % self.path)
+            print 'Files created: %s_pdf_*.zip' % self.path
+            self.pdfs = PdfDownloader(self.pdf_zip_file, self.path, self.pdf_workers)
+        if self.previous is not None:
+            self.delta = journal.CompletedJournal('%s_delta.txt' % self.path)
+            print 'File created: %s_delta.txt' % self.path
+        if database:
+            sink = sinks.SQLiteSink('%s.db' % self.path)
+            print 'File created: %s.db' % self.path
+            self.restore_sink_rows(sink)
+            self.sinks.append(sink)
+        if parquet:
+            sink = sinks.ParquetSink('%s_parquet' % self.path)
+            print 'Files created: %s_parquet/part-*.parquet' % self.path
+            self.restore_sink_rows(sink)
+            self.sinks.append(sink)
+        if jsonl:
+            if jsonl == 'none':
+                jsonl = None
+            jsonl_filename = self.path + sinks.JSONL_EXTENSIONS[jsonl]
+            sink = sinks.JSONLinesSink(jsonl_filename, '%s_jsonl_checkpoint.txt' % self.path, 
+                                       jsonl, self.ftext)
+            print 'File created: %s' % jsonl_filename
+            self.restore_sink_rows(sink)
+            self.sinks.append(sink)
+
+    def check_legacy_zip(self, path):
+        '''
+        Harvests started before archives were sharded saved all their texts
+        (or pdfs) in one zip, which has no directory if the harvest was killed.
+        Repair it so the files already saved can be read. It's left where it
+        is -- anything harvested from now on goes in the sharded zips.
+        '''
+        if not os.path.exists(path):
+            return
+        try:
+            files = archives.repair_zip(path)
+        except (IOError, OSError), error:
+            print 'WARNING: %s is from an earlier harvest and couldn\'t be repaired (%s)' % (path, error)
+            return
+        if files is not None:
+            print 'Repaired %s -- it holds %s files' % (path, files)
+        print 'Files in %s are kept, but new files will be saved in %s_*.zip' % (path, path[:-4])
+
+    def restore_sink_rows(self, sink):
+        '''
+        Save any articles that are in the CSV file but missing from a sink --
+        either because the sink is new, or because the last batch was lost
+        when the harvest stopped.
+        '''
+        if not len(self.journal):
+            return
+        saved = sink.get_ids()
+        restored = 0
+        for row in sinks.read_csv(self.filename):
+            if row['id'] in self.journal and row['id'] not in saved:
+                sink.write(row)
+                saved.add(row['id'])
+                restored += 1
+        sink.checkpoint()
+        if restored:
+            print 'Restored %s articles from %s' % (restored, self.filename)
+
+    def checkpoint(self):
+        '''
+        Make sure the articles written since the last checkpoint are saved
+        by every sink, then add them to the journal. Call with write_lock held.
+        '''
+        for sink in self.sinks:
+            sink.checkpoint()
+        for article_id in sorted(self.pending):
+            # Unchanged articles copied from the previous harvest have no note
+            if self.delta is not None and self.pending[article_id] is not None:
+                self.delta.add(article_id, self.pending[article_id])
+            self.journal.add(article_id)
+        self.pending.clear()
+
+    def is_harvested(self, article_id):
+        '''
+        True if an article has already been written.
+        '''
+        return article_id in self.journal or str(article_id) in self.pending
+
+    def skip_result(self, article_id, corrections=None):
+        '''
+        True if a result doesn't need to be retrieved -- because it's already
+        been written, or (in an incremental harvest) it hasn't changed since
+        the previous harvest.
+        '''
+        article_id = str(article_id)
+        if self.previous is not None:
+            self.seen.add(article_id)
+            # Results pages don't show correction counts, so only results from 
+            # the API can be checked for new corrections
+            if (article_id in self.previous and corrections is not None 
+                and int(corrections) != self.previous[article_id]):
+                # Skipped only if the corrected version has already been saved
+                return article_id in self.delta or article_id in self.pending
+        if self.is_harvested(article_id):
+            return True
+        return self.previous is not None and article_id in self.previous
+
+    def get_change(self, article):
+        '''
+        Describe how an article has changed since the previous harvest --
+        'new' or 'corrected', followed by the previous and current correction counts.
+        '''
+        if self.previous is None:
+            return None
+        article_id = str(article['id'])
+        if article_id in self.previous:
+            change, old = 'corrected', self.previous[article_id]
+        else:
+            change, old = 'new', None
+        return '\t'.join([change] + ['' if count is None else str(count) 
+                                     for count in (old, article.get('corrections'))])
+
+    def copy_unchanged(self):
+        '''
+        Copy the articles that haven't changed since the previous harvest
+        from its CSV file, JSON Lines file or database, so that this harvest
+        holds every current result -- and can be the previous harvest next time.
+        '''
+        copied = 0
+        with self.write_lock:
+            for row in sinks.read_articles(self.previous_path):
+                article_id = str(row['id'])
+                if article_id not in self.seen or self.is_harvested(article_id):
+                    continue
+                for sink in self.sinks:
+                    sink.write(row)
+                self.pending[article_id] = None
+                copied += 1
+                if len(self.pending) >= CHECKPOINT_EVERY or [sink for sink in self.sinks if sink.full()]:
+                    self.checkpoint()
+            self.checkpoint()
+        if copied:
+            print 'Copied %s unchanged articles from %s' % (copied, self.previous_path)
+
+    def finish_delta(self):
+        '''
+        Add the articles in the previous harvest that are no longer in the
+        results to the delta, and report the changes.
+        '''
+        with self.write_lock:
+            self.checkpoint()
+            for article_id in sorted(set(self.previous) - self.seen):
+                old = self.previous[article_id]
+                self.delta.add(article_id, 'removed\t%s\t' % ('' if old is None else old))
+        counts = {'new': 0, 'corrected': 0, 'removed': 0}
+        for note in self.delta.ids.values():
+            counts[note.split('\t')[0]] += 1
+        print 'Changes since the previous harvest: %s new, %s corrected, %s removed (see %s_delta.txt)' % (
+              counts['new'], counts['corrected'], counts['removed'], self.path)
 
-    def harvest(self, query, filename=None, start=0, text=None, pdf=None, zip_dir='title', gui=None):
+    def close_output_files(self):
+        '''
+        Save the last checkpoint, close the journal and the sinks, 
+        and seal the last of the zips.
+        '''
+        with self.write_lock:
+            self.checkpoint()
+        self.journal.close()
+        if self.delta is not None:
+            self.delta.close()
+        for sink in self.sinks:
+            sink.close()
+        for archive in [self.text_zip_file, self.pdf_zip_file]:
+            if archive is not None:
+                archive.close()
+
+    def harvest(self, query, filename=None, start=0, text=None, pdf=None, zip_dir='title', gui=None, workers=1,
+                backend='html', api_key=None, lookahead=1, shards=1, max_shard_results=None, 
+                pdf_workers=2, database=False, parquet=False, jsonl=None, ftext=True, 
+                previous=None):
         '''
         Harvest the results of the supplied query, saving a CSV to the 
         (optional) filename. If no filename is given 
+        Set workers to retrieve the articles on each results page concurrently.
+        Set lookahead to the number of upcoming results pages to retrieve
+        in the background while the current page is processed (0 for none).
+        Set backend to 'api' to harvest full records 100 at a time from the
+        Trove API rather than scraping the web interface.
+        Set shards to split the query into date windows of no more than
+        max_shard_results articles, and harvest that many windows at once.
+        Pdfs are downloaded in the background by pdf_workers threads, so
+        the CSV may be finished well before the pdf zip.
+        Set database to also save the articles in an SQLite database
+        with a full-text index of their texts, and parquet to save them
+        in Parquet files for loading into dataframes. Set jsonl to 'gzip', 
+        'zstd' or 'none' to save them in a JSON Lines file compressed that way.
+        Set ftext to False to leave the text with paragraph tags out of the 
+        CSV and JSON Lines files.
+        Set previous to the CSV, JSON Lines or database file of an earlier
+        harvest of the same query to only harvest the articles that are new, 
+        or (using the API backend) have been corrected since. The changes are
+        listed in [filename]_delta.txt. Once all the results have been checked,
+        the unchanged articles are copied from the previous harvest, so the
+        new files can be used as the previous harvest next time. The text and
+        pdf zips only hold the new and corrected articles.
         '''
         self.query = query
         self.zip_dir = zip_dir
-        self.set_output_files(filename, text, pdf)
+        self.workers = int(workers)
+        self.lookahead = int(lookahead)
+        self.backend = backend
+        if api_key:
+            self.api_key = api_key
+        self.shards = int(shards)
+        self.pdf_workers = int(pdf_workers)
+        self.ftext = ftext
+        if previous:
+            self.previous_path = previous
+            self.previous = sinks.read_corrections(previous)
+            print 'Comparing with %s articles in %s' % (len(self.previous), previous)
+        self.set_output_files(filename, text, pdf, database, parquet, jsonl)
         if start:
             #self.completed = int(start)
             self.totals['processed'] = int(start)
+            self.totals['harvested'] = int(start)
         if gui:
             self.gui = gui
-        page_url = '%s&s=%s' % (self.query, self.totals['processed'])
-        news = scrape.TroveNewspapersClient(titles=False)
+        if self.pdfs is not None:
+            self.pdfs.start()
+        try:
+            if self.shards > 1:
+                result = self.harvest_shards(max_shard_results)
+            elif self.backend == 'api':
+                result = self.harvest_api()
+            else:
+                result = self.harvest_html()
+            if self.pdfs is not None:
+                result = self.finish_pdfs(result)
+            # Only a complete run through the results shows which articles are unchanged, 
+            # and which have gone
+            if self.delta is not None and result and result['status'] == 'success' and not start:
+                self.copy_unchanged()
+                self.finish_delta()
+        finally:
+            self.close_output_files()
+        return result
+
+    def harvest_html(self):
+        '''
+        Harvest the results of the query by scraping the results pages,
+        and then each article.
+        '''
+        start = self.totals['processed']
+        page_url = '%s&s=%s' % (self.query, start)
         try:   
-            news.search(url=page_url)
+            first_page = self.news.search(url=page_url)
         except Exception, error:
             return self.harvest_failure(error)
         else:
             print 'Harvesting...'
             # Calculate number of pages
-            total = int(string.replace(news.total_results, ',', ''))
+            total = first_page.total
             #self.total = total
             self.totals['total'] = total
-            if start:
-                num_pages = (total - int(start)) / 20
-            else:
-                num_pages = total / 20
-            page = 1
+            # Start retrieving the remaining pages in the background
+            offsets = range(start + 20, total, 20)
+            pages = PagePrefetcher(self.news, self.query, offsets, self.lookahead)
             # Write data from first page
-            self.write_rows(news)
+            failure = self.write_rows(first_page.results)
+            if failure is not None:
+                pages.stop()
+                return failure
             # Loop over remaining pages
-            while page <= num_pages:
-                news.reset()
-                news.tries = 10                
-                page_url = '%s&s=%s' % (self.query, self.totals['processed'])
+            for page_url, results, error in pages:
                 print page_url
-                try:
-                    news.search(url=page_url)
-                except Exception, error:
+                if error:
                     return self.harvest_failure(error)
-                else:
-                    self.write_rows(news)
-                    page += 1
+                failure = self.write_rows(results)
+                if failure is not None:
+                    pages.stop()
+                    return failure
         return {'status': 'success', 'error': None, 'totals': self.totals}
     
-    def write_rows(self, news):
+    def harvest_shards(self, max_results):
         '''
-        Loop through a results page, retrieving and saving details for each article.
+        Split the query into date windows and harvest several windows at once.
+        All the windows write to the same CSV and zips.
         '''
-        results = news.results
-        for result in results:
-            if result['id']:
-                news.reset()
-                news.tries = 10
-                # Get details of article
-                try:
-                    news.get_article(result['id'])
-                except Exception, error:
-                    return self.harvest_failure(error)
-                else:
+        try:
+            plans = shards.plan_shards(self.query, max_results or shards.MAX_RESULTS, 
+                                       self.backend, self.api_key)
+        except Exception, error:
+            return self.harvest_failure(error)
+        self.totals['total'] = sum([plan['total'] for plan in plans])
+        print 'Harvesting %s shards...' % len(plans)
+        harvesters = [self.make_shard_harvester(plan['query']) for plan in plans]
+        outcomes = workers.ordered_map(run_shard, harvesters, self.shards)
+        errors = []
+        for harvester, (result, error) in zip(harvesters, outcomes):
+            for key in ['processed', 'harvested', 'unavailable']:
+                self.totals[key] += harvester.totals[key]
+            if error:
+                errors.append(error)
+            elif result['error']:
+                errors.append(result['error'])
+        if errors:
+            return self.harvest_failure(errors[0])
+        return {'status': 'success', 'error': None, 'totals': self.totals}
+
+    def make_shard_harvester(self, query):
+        '''
+        Create a harvester for one date window that shares this harvester's
+        output files.
+        '''
+        harvester = TroveNewspapersHarvester()
+        for attr in ['path', 'filename', 'csv_file', 'text_zip_file', 'pdf_zip_file', 
+                     'zip_dir', 'workers', 'lookahead', 'backend', 'api_key', 
+                     'pdfs', 'journal', 'pending', 'write_lock', 'news', 'sinks',
+                     'previous', 'seen', 'delta']:
+            setattr(harvester, attr, getattr(self, attr))
+        harvester.query = query
+        # Return errors rather than printing restart instructions
+        harvester.gui = True
+        return harvester
+
+    def load_completed_ids(self):
+        '''
+        Add the ids of articles already in the CSV file to a new journal,
+        so that harvests started before journals were kept can be resumed.
+        '''
+        with open(self.filename, 'rb') as csv_file:
+            for row in csv.reader(csv_file):
+                if row:
+                    self.journal.add(row[0])
+
+    def harvest_api(self):
+        '''
+        Harvest the results of the query from the Trove API, which
+        returns the full details and text of 100 articles per request.
+        In an incremental harvest the results are listed without their text,
+        and only the articles that are new or have been corrected are retrieved.
+        '''
+        client = api.TroveApiClient(key=self.api_key)
+        params = api.make_api_params(self.query)
+        text = self.previous is None
+        try:
+            total, records = client.search(params, self.totals['processed'], text=text)
+        except Exception, error:
+            return self.harvest_failure(error)
+        print 'Harvesting...'
+        self.totals['total'] = total
+        while records:
+            wanted = [record for record in records 
+                      if not self.skip_result(record['id'], record.get('correctionCount'))]
+            if not text:
+                outcomes = workers.ordered_map(client.get_article, 
+                                               [record['id'] for record in wanted], self.workers)
+                for full_record, error in outcomes:
+                    if error:
+                        return self.harvest_failure(error)
+                wanted = [full_record for full_record, error in outcomes]
+            wanted = dict([(str(record['id']), record) for record in wanted])
+            for record in records:
+                record = wanted.get(str(record['id']))
+                if record is not None:
+                    article = api.record_to_article(record)
                     print '%s of %s -- %s' % (self.totals['processed'] + 1, 
                                               self.totals['total'], 
-                                              news.results['title'])
-                    self.csv_file.writerow(news.results)
-                    if self.text_zip_file or self.pdf_zip_file:
-                        if self.zip_dir == 'year':
-                            directory = str(news.results['issue_year'])
-                            filename = '%s-%s-%s-%s-p%s' % (news.results['newspaper_id'], 
-                                                            string.replace(news.results['newspaper_title'], ' ', '-'),
-                                                            news.results['id'], 
-                                                            string.replace(news.results['issue_date'], ' ', '-'), 
-                                                            news.results['page'])
-                        else:
-                            directory = '%s-%s' % (news.results['newspaper_id'], 
-                                                   string.replace(news.results['newspaper_title'], ' ', '-'))
-                            filename = '%s-%s-p%s' % (news.results['id'], 
-                                                      string.replace(news.results['issue_date'], ' ', '-'), 
-                                                      news.results['page'])
-                    if self.text_zip_file:
-                        self.text_zip_file.writestr(('%s/%s.txt' % 
-                                                     #encode added to filename because of problem with Python 2.5
-                                                    (directory, filename)).encode('utf-8'), 
-                                                    news.results['text'])
-                    if self.pdf_zip_file:
-                        pdf_url = 'http://trove.nla.gov.au/ndp/del/printArticlePdf/%s/3?print=n' % news.results['id']
-                        try:
-                            content = self.try_url(pdf_url)
-                        except Exception, error:
-                            return self.harvest_failure(error)
-                        else:
-                            #encode added to filename because of problem with Python 2.5
-                            self.pdf_zip_file.writestr(('%s/%s.pdf' % 
-                                                       (directory, filename)).encode('utf-8'), 
-                                                       content.read())
-                    self.totals['processed'] += 1
-                    time.sleep(1)
-            else:
+                                              article['title'])
+                    failure = self.write_article(article)
+                    if failure is not None:
+                        return failure
+                self.totals['processed'] += 1
+                self.totals['harvested'] += 1
+            if self.totals['processed'] >= total:
+                break
+            try:
+                total, records = client.search(params, self.totals['processed'], text=text)
+            except Exception, error:
+                return self.harvest_failure(error)
+        return {'status': 'success', 'error': None, 'totals': self.totals}
+
+    def write_rows(self, results):
+        '''
+        Loop through a results page, retrieving and saving details for each article.
+        If workers is greater than 1 the articles on the page are retrieved
+        concurrently, but they are still written in result order.
+        '''
+        for result, article, error in self.get_articles(results):
+            if not result['id']:
                 self.totals['unavailable'] += 1
+            elif error:
+                return self.harvest_failure(error)
+            elif article is None:
+                # Already harvested (or unchanged since the previous harvest)
+                self.totals['processed'] += 1
+            else:
+                print '%s of %s -- %s' % (self.totals['processed'] + 1, 
+                                          self.totals['total'], 
+                                          article['title'])
+                failure = self.write_article(article)
+                if failure is not None:
+                    return failure
+                self.totals['processed'] += 1
             self.totals['harvested'] += 1
 
-                    
-    def try_url(self, url):
+    def get_articles(self, results):
         '''
-        Set up a loop to retry downloads in the case of server (5xx) errors.
+        Generate (result, article, error) tuples for a page of results.
+        Articles are fetched one at a time as they're needed, or all at once
+        using a pool of worker threads. Articles that have already been
+        harvested (or haven't changed since the previous harvest) aren't 
+        fetched again, and have an article of None.
         '''
-        success = False
-        try_num = 1
-        print 'Downloading pdf...'
-        while success is False and try_num <= 10:
-            if try_num > 1:
-                print 'Download failed. Trying again in 10 seconds...'
-                time.sleep(10)
-            try:
-                content = get_url(url)
-            except ServerError:
-                if try_num < 10:
-                    try_num += 1
-                    continue
+        if self.workers > 1:
+            ids = [result['id'] for result in results 
+                   if result['id'] and not self.skip_result(result['id'], result.get('corrections'))]
+            outcomes = dict(zip(ids, workers.ordered_map(self.get_article_details, ids, self.workers)))
+            for result in results:
+                if result['id'] in outcomes:
+                    article, error = outcomes[result['id']]
+                    yield (result, article, error)
                 else:
-                    raise
-            except Exception:
-                raise
-            else:
-                if content is not None:
-                    success = True
+                    yield (result, None, None)
+        else:
+            for result in results:
+                if result['id'] and not self.skip_result(result['id'], result.get('corrections')):
+                    article, error = workers.call(self.get_article_details, result['id'])
+                    yield (result, article, error)
                 else:
-                    if try_num == 10:
-                        raise ServerError('Nothing was returned')
-                    else:
-                        try_num += 1
-        return content
+                    yield (result, None, None)
+
+    def get_article_details(self, article_id):
+        '''
+        Retrieve the details of an article. Safe to call from worker threads.
+        '''
+        return self.news.get_article(article_id, tries=10)
+
+    def write_article(self, article):
+        '''
+        Save the details of an article to the CSV file and the zips.
+        Articles that have already been written are skipped.
+        '''
+        if self.text_zip_file is not None or self.pdf_zip_file is not None:
+            if self.zip_dir == 'year':
+                directory = str(article['issue_year'])
+                filename = '%s-%s-%s-%s-p%s' % (article['newspaper_id'], 
+                                                string.replace(article['newspaper_title'], ' ', '-'),
+                                                article['id'], 
+                                                string.replace(article['issue_date'], ' ', '-'), 
+                                                article['page'])
+            else:
+                directory = '%s-%s' % (article['newspaper_id'], 
+                                       string.replace(article['newspaper_title'], ' ', '-'))
+                filename = '%s-%s-p%s' % (article['id'], 
+                                          string.replace(article['issue_date'], ' ', '-'), 
+                                          article['page'])
+        # Shard harvesters share the output files
+        with self.write_lock:
+            if self.is_harvested(article['id']):
+                return
+            for sink in self.sinks:
+                sink.write(article)
+            if self.text_zip_file is not None:
+                self.text_zip_file.writestr(article['id'], encode_name('%s/%s.txt' % 
+                                                                       (directory, filename)), 
+                                            article['text'])
+            if self.pdfs is not None:
+                # Queued before the article is marked as completed, so it won't be missed on restart
+                self.pdfs.add(article['id'], encode_name('%s/%s.pdf' % (directory, filename)))
+            # Articles are only marked as completed once every sink has saved them
+            self.pending[str(article['id'])] = self.get_change(article)
+            if len(self.pending) >= CHECKPOINT_EVERY or [sink for sink in self.sinks if sink.full()]:
+                self.checkpoint()
+
+    def finish_pdfs(self, result):
+        '''
+        Wait for any queued pdfs to be downloaded.
+        '''
+        if self.pdfs.queue.qsize():
+            print 'Waiting for %s pdfs to download...' % self.pdfs.queue.qsize()
+        errors = self.pdfs.finish()
+        if errors and result and result['status'] == 'success':
+            print '%s pdfs could not be downloaded.' % len(errors)
+            return self.harvest_failure(errors[0])
+        return result
 
     def harvest_failure(self, error):
         '''
@@ -246,46 +634,213 @@ class TroveNewspapersHarvester:
             return {'status': 'error', 'error': error, 'totals': self.totals}
         else:
             print 'Harvest failed with error %s\n' % error
-            if self.totals['harvested'] > 0:
+            with self.write_lock:
+                self.checkpoint()
+            if len(self.journal) > 0:
                 error_file = '%s_error.txt' % self.path
                 error_message = 'Sorry your harvest failed.\n'
                 error_message += 'The error was %s.\n\n' % error
                 error_message += 'But never fear, you can easily restart your harvest.\n'
-                error_message += 'Just set the "start" option in harvest.ini to %s,\n' % self.totals['harvested']
-                error_message += 'and then run "do_harvest" again.\n\n'
-                error_message += 'Note that row number %s in the CSV file might be repeated.\n' % self.totals['harvested']
+                error_message += 'Just run "do_harvest" again with the same settings.\n\n'
+                error_message += 'The ids of the %s articles already harvested are saved in %s_done.txt,\n' % (len(self.journal), 
+                                                                                                       self.path)
+                error_message += 'and they will be skipped.\n'
                 with open(error_file, 'w') as efile:
                     efile.write(error_message)
-                print 'To resume harvest use the following command:\n'
-                restart_message = 'python do_harvest.py -q "%s" -f "%s" -s %s' % (self.query, 
-                                                                       self.filename, 
-                                                                       self.totals['harvested'])
-                if self.text_zip_file:
+                print 'To resume harvest run the same command again -- articles already harvested will be skipped:\n'
+                restart_message = 'python do_harvest.py -q "%s" -f "%s"' % (self.query, self.filename)
+                if self.text_zip_file is not None:
                     restart_message += ' -t'
-                if self.pdf_zip_file:
+                if self.pdf_zip_file is not None:
                     restart_message += ' -p'
+                for sink in self.sinks:
+                    if isinstance(sink, sinks.SQLiteSink):
+                        restart_message += ' --database'
+                    elif isinstance(sink, sinks.ParquetSink):
+                        restart_message += ' --parquet'
+                    elif isinstance(sink, sinks.JSONLinesSink):
+                        restart_message += ' --jsonl %s' % (sink.compression or 'none')
+                if not self.ftext:
+                    restart_message += ' --no-ftext'
+                if self.previous_path:
+                    restart_message += ' --previous "%s"' % self.previous_path
+                if self.backend != 'html':
+                    restart_message += ' -b %s' % self.backend
+                if self.shards > 1:
+                    restart_message += ' --shards %s' % self.shards
                 print restart_message
             return False
 
-def get_url(url):
+def encode_name(name):
+    '''
+    Encode the name of a file in a zip as UTF-8 (added because of a problem with Python 2.5).
+    Names made from the details of API records are already encoded.
+    '''
+    if isinstance(name, unicode):
+        return name.encode('utf-8')
+    return name
+
+def run_shard(harvester):
     '''
-    Retrieve page.
+    Harvest the date window of a shard harvester.
+    '''
+    if harvester.backend == 'api':
+        return harvester.harvest_api()
+    else:
+        return harvester.harvest_html()
+
+class PdfDownloader:
+    '''
+    Downloads article pdfs into a sharded archive using its own pool of worker
+    threads, so that waiting for pdfs doesn't hold up the harvest.
+    Each pdf is streamed to a temporary file before being added to the archive.
+    Queued and downloaded pdfs are journalled, so any still waiting
+    when a harvest stops are downloaded when it's restarted.
+    '''
+    def __init__(self, archive, path, workers=2, queue_size=PDF_QUEUE_SIZE, tries=10):
+        self.archive = archive
+        self.path = path
+        self.workers = workers
+        self.tries = tries
+        self.queue = Queue.Queue(maxsize=queue_size)
+        self.queued = journal.CompletedJournal('%s_pdf_queue.txt' % path)
+        self.done = journal.CompletedJournal('%s_pdf_done.txt' % path)
+        self.pending = set()
+        self.errors = []
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def start(self):
+        for num in range(self.workers):
+            thread = threading.Thread(target=self.run)
+            thread.setDaemon(True)
+            thread.start()
+            self.threads.append(thread)
+        # Requeue any pdfs left over from an earlier harvest
+        for article_id, name in self.queued.ids.items():
+            self.add(article_id, name)
+
+    def add(self, article_id, name):
+        '''
+        Queue the pdf of an article to be saved in the archive as name.
+        Waits if the queue is full.
+        '''
+        article_id = str(article_id)
+        with self.lock:
+            if article_id in self.pending or article_id in self.done:
+                return
+            self.pending.add(article_id)
+        self.queued.add(article_id, name)
+        self.queue.put((article_id, name))
+
+    def run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            article_id, name = job
+            try:
+                self.download(article_id, name)
+            except Exception, error:
+                print 'Failed to download pdf of article %s: %s' % (article_id, error)
+                with self.lock:
+                    self.errors.append(error)
+
+    def download(self, article_id, name):
+        temp_name = '%s_%s.pdf.tmp' % (self.path, article_id)
+        try:
+            with open(temp_name, 'w+b') as temp_file:
+                retry.RetryPolicy(tries=self.tries).call(functools.partial(download_pdf, out=temp_file), 
+                                                         PDF_URL % article_id)
+            self.archive.write(article_id, name, temp_name)
+        finally:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+        self.done.add(article_id)
+        print 'Downloaded pdf of article %s' % article_id
+
+    def finish(self):
+        '''
+        Wait for the queue to empty, then stop the workers.
+        Returns a list of the errors from any failed downloads.
+        '''
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.queued.close()
+        self.done.close()
+        return self.errors
+
+class PagePrefetcher:
+    '''
+    Retrieves results pages in a background thread, keeping up to
+    lookahead pages waiting in a queue. Iterate over it to get
+    (page_url, results, error) tuples in page order.
+    With a lookahead of 0, each page is retrieved when it's needed.
+    '''
+    def __init__(self, news, query, offsets, lookahead=1):
+        self.news = news
+        self.query = query
+        self.offsets = offsets
+        self.lookahead = lookahead
+        self.stopped = threading.Event()
+        if lookahead > 0:
+            self.pages = Queue.Queue(maxsize=lookahead)
+            self.thread = threading.Thread(target=self.run)
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+    def __iter__(self):
+        if self.lookahead > 0:
+            for offset in self.offsets:
+                page = self.pages.get()
+                yield page
+                if page[2]:
+                    break
+        else:
+            for offset in self.offsets:
+                page = self.get_page(offset)
+                yield page
+                if page[2]:
+                    break
+
+    def run(self):
+        for offset in self.offsets:
+            page = self.get_page(offset)
+            # Wait for room in the queue, unless the harvest has been stopped
+            while not self.stopped.isSet():
+                try:
+                    self.pages.put(page, timeout=1)
+                except Queue.Full:
+                    continue
+                else:
+                    break
+            if self.stopped.isSet() or page[2]:
+                return
+
+    def get_page(self, offset):
+        page_url = '%s&s=%s' % (self.query, offset)
+        try:
+            result = self.news.search(url=page_url, tries=10)
+        except Exception, error:
+            return (page_url, None, error)
+        else:
+            return (page_url, result.results, None)
+
+    def stop(self):
+        self.stopped.set()
+
+def download_pdf(url, out):
+    '''
+    Stream a pdf to the file object out using the shared keep-alive session.
     '''
-    user_agent = 'Mozilla/5.0 (X11; Linux i686; rv:2.0.1) Gecko/20100101 Firefox/4.0.1'
-    headers = { 'User-Agent' : user_agent }
-    req = Request(url, None, headers)
     try:
-        response = urlopen(req)
+        response = fetch.download(url, out)
     except HTTPError, error:
         if error.code >= 500:
             raise ServerError(error)
         else:
             raise
-    except URLError, error:
-        raise
     else:
         return response
-
-class ServerError(Exception):
-    pass
-
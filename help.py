@@ -112,16 +112,28 @@ into the spreadsheet or database of your choice. Note the YYYY-MM-DD date stamp
 This tells you when the harvest was run, so you can repeat a harvest without worrying about overwriting your existing results.
 </p>
 
-<p><b>Text zip file: my_project_2011-07-12_text.zip</b><br></br>
-This is a zip file that contains the text contents of all the individual articles. 
+<p><b>Text zip files: my_project_2011-07-12_text_001.zip, my_project_2011-07-12_text_002.zip...</b><br></br>
+These zip files contain the text contents of all the individual articles. A new zip is started 
+whenever the current one reaches 10,000 files or 256MB -- the zip that's being written has .part 
+on the end of its name until it's complete. 
 You can change the internal folder structure by setting the 'Organise files by' option. 
-Like the CSV file, this file is date stamped to prevent confusion.
+Like the CSV file, these files are date stamped to prevent confusion.
 </p>
 
-<p><b>PDF zip file: my_project_2011-07-12_pdf.zip</b><br></br>
-This is a zip file that contains the PDF versions of all the individual articles. 
+<p><b>Text index: my_project_2011-07-12_text_index.txt</b><br></br>
+This file lists the contents of the text zips -- the zip number, position and name of the 
+file for each article id -- so you can find an article without opening every zip.
+</p>
+
+<p><b>PDF zip files: my_project_2011-07-12_pdf_001.zip, my_project_2011-07-12_pdf_002.zip...</b><br></br>
+These zip files contain the PDF versions of all the individual articles, split up in the same way 
+as the text zips. 
 You can change the internal folder structure by setting the 'Organise files by' option. 
-Like the CSV file, this file is date stamped to prevent confusion.
+Like the CSV file, these files are date stamped to prevent confusion.
+</p>
+
+<p><b>PDF index: my_project_2011-07-12_pdf_index.txt</b><br></br>
+This file lists the contents of the PDF zips in the same way as the text index.
 </p>
 <hr></hr>
 <a name="restart">
@@ -0,0 +1,116 @@
+'''
+journal.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides an append-only journal of the ids of articles that have been
+completely harvested.
+
+Each id is written on its own line as soon as the article has been saved,
+and the journal is synced to disk every few ids. When a harvest is restarted
+the journal is read back into a set, so completed articles can be skipped
+without fetching them again -- no matter where they now appear in the results.
+
+An id can be saved with a short note, eg. the name a pdf should be given.
+
+USAGE:
+
+journal = journal.CompletedJournal('/home/wragge/inclement_done.txt')
+if article_id not in journal:
+    ...save the article...
+    journal.add(article_id)
+journal.close()
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import os
+import threading
+
+# Number of ids to write between syncs
+SYNC_EVERY = 20
+
+class CompletedJournal:
+    '''
+    A set of completed article ids (each with an optional note),
+    backed by an append-only file.
+    '''
+    def __init__(self, path, sync_every=SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self.ids = {}
+        self.unsynced = 0
+        self.lock = threading.Lock()
+        self.existed = os.path.exists(path)
+        size = 0
+        partial = False
+        if self.existed:
+            with open(path, 'rb') as journal_file:
+                for line in journal_file:
+                    # A partly written last line is ignored
+                    if line.endswith('\n'):
+                        fields = line.rstrip('\n').split('\t', 1)
+                        self.ids[fields[0]] = fields[1] if len(fields) > 1 else None
+                        size += len(line)
+                    else:
+                        partial = True
+        if partial:
+            # Cut it off, so the next id starts at the beginning of a line
+            with open(path, 'r+b') as journal_file:
+                journal_file.truncate(size)
+        self.journal_file = open(path, 'ab')
+
+    def __contains__(self, article_id):
+        return str(article_id) in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, article_id):
+        '''
+        Return the note saved with an id.
+        '''
+        return self.ids.get(str(article_id))
+
+    def add(self, article_id, note=None):
+        '''
+        Record an article as completed.
+        '''
+        article_id = str(article_id)
+        with self.lock:
+            if article_id in self.ids:
+                return
+            if note is None:
+                self.journal_file.write('%s\n' % article_id)
+            else:
+                self.journal_file.write('%s\t%s\n' % (article_id, note))
+            self.journal_file.flush()
+            self.ids[article_id] = note
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every:
+                self.sync()
+
+    def sync(self):
+        os.fsync(self.journal_file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        with self.lock:
+            if not self.journal_file.closed:
+                self.journal_file.flush()
+                self.sync()
+                self.journal_file.close()
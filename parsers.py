@@ -0,0 +1,401 @@
+'''
+parsers.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides the parser backends used by TroveNewspapersClient to extract
+results from search result pages and details from article pages.
+
+    'soup' -- parses the whole page with BeautifulSoup.
+    'fast' -- for search result pages, cuts the #newspapers block (which
+              holds the total and the results) out of the page, and parses
+              only that along with the page head (so the character encoding
+              is worked out the same way). Falls back to 'soup' if the block
+              can't be found.
+              For article pages, only the regions we read are added to
+              the tree -- navigation, scripts and comments are skipped.
+
+The same extraction code is used with both backends, so they should produce
+identical results. This can be checked against a set of saved pages
+(eg. a cache directory created by do_harvest.py) by running:
+
+python parsers.py [cache directory or html files]
+
+Without any arguments the saved pages in data/corpus are checked -- these
+include results pages with '[coming soon]' results, truncated newspaper
+titles, stray markup, different character encodings, and no results.
+The text and ftext of the Article built from each article page, and from
+the OCR text fixtures in data/corpus/ocr-text.html (non-breaking and double
+spaces, empty spans and empty paragraphs), are also compared with the output
+of the old two-pass extraction. The script exits with a status of 1 if
+there are any differences.
+
+The time taken and the (approximate) memory used by the parse tree
+are reported for each backend.
+
+USAGE:
+
+client = scrape.TroveNewspapersClient(parser='soup')
+
+parser = parsers.get_parser('fast')
+total, results = parser.parse_results(html, client.extract_details)
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import os
+import re
+import sys
+import time
+from string import replace
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from BeautifulSoup import BeautifulSoup, SoupStrainer, Tag
+
+DEFAULT_PARSER = 'fast'
+NEWSPAPERS_RE = re.compile(r'<div[^>]*\bid=["\']?newspapers\b[^>]*>', re.IGNORECASE)
+DIV_RE = re.compile(r'<(/?)div\b', re.IGNORECASE)
+HEAD_END_RE = re.compile(r'</head\s*>', re.IGNORECASE)
+# The parts of an article page used by extract_article_details -- the
+# newsarticle_headline meta, the page select, and these tags and classes
+# (the pageId is found in the raw html)
+ARTICLE_CLASSES = {'div': ['title', 'issue', 'ocr-text'],
+                   'span': ['about'],
+                   'p': ['numCorrections']}
+
+class SoupParser:
+    '''
+    Parses the whole results page.
+    '''
+    def parse_results(self, html, extract):
+        '''
+        Returns a tuple -- (total results, list of results).
+        Each result's dl element is converted by the extract function.
+        '''
+        return self.extract_results(BeautifulSoup(html), extract)
+
+    def parse_article(self, html):
+        '''
+        Returns the parse tree of an article page.
+        '''
+        return BeautifulSoup(html)
+
+    def extract_results(self, page, extract):
+        newspapers = page.find('div', attrs={'id': 'newspapers'})
+        total = newspapers.find('div', 'hdrresult').p.strong.string.strip().replace(',','')
+        results = [extract(result) for result in newspapers.findAll('dl')]
+        return (total, results)
+
+class FastParser(SoupParser):
+    '''
+    Parses only the head and the #newspapers block of the results page.
+    '''
+    def parse_results(self, html, extract):
+        fragment = make_fragment(html)
+        if fragment is None:
+            return SoupParser.parse_results(self, html, extract)
+        return self.extract_results(BeautifulSoup(fragment), extract)
+
+    def parse_article(self, html):
+        return BeautifulSoup(html, parseOnlyThese=ARTICLE_STRAINER)
+
+def is_article_region(name, attrs):
+    '''
+    Check whether a tag is one of the article page regions we need.
+    Scripts are kept too, otherwise any markup inside them would be
+    parsed as if it were part of the page.
+    '''
+    if name in BeautifulSoup.QUOTE_TAGS:
+        return True
+    for key, value in attrs:
+        if key == 'name':
+            if value == 'newsarticle_headline' or (name == 'select' and value == 'id'):
+                return True
+        elif key == 'class' and name in ARTICLE_CLASSES:
+            for css_class in value.split():
+                if css_class in ARTICLE_CLASSES[name]:
+                    return True
+    return False
+
+ARTICLE_STRAINER = SoupStrainer(is_article_region)
+
+PARSERS = {'soup': SoupParser, 'fast': FastParser}
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'data', 'corpus')
+
+def get_parser(name=None):
+    '''
+    Create a parser backend by name, eg. 'fast' or 'soup'.
+    '''
+    try:
+        return PARSERS[name or DEFAULT_PARSER]()
+    except KeyError:
+        raise ValueError('Unknown parser: %s' % name)
+
+def make_fragment(html):
+    '''
+    Cut the head and the #newspapers block out of a results page and
+    put them back together as a small page. Returns None if either
+    can't be found.
+    '''
+    head_end = HEAD_END_RE.search(html)
+    start = NEWSPAPERS_RE.search(html)
+    if head_end is None or start is None or start.start() < head_end.end():
+        return None
+    end = find_element_end(html, start.end())
+    return '%s<body>%s</body></html>' % (html[:head_end.end()], html[start.start():end])
+
+def find_element_end(html, pos):
+    '''
+    Find the end of the div whose opening tag finishes at pos,
+    allowing for nested divs. Returns the end of the page if
+    the div is never closed.
+    '''
+    depth = 1
+    for match in DIV_RE.finditer(html, pos):
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                return html.find('>', match.end()) + 1 or len(html)
+        else:
+            depth += 1
+    return len(html)
+
+def run_parser(name, kind, html, url):
+    '''
+    Extract the details from a page using the named backend.
+    Returns a tuple -- (total results, list of results). For an
+    article page, the total is None and the list holds the article.
+    '''
+    # Imported here because scrape imports this module
+    import scrape
+    client = scrape.TroveNewspapersClient(titles=False, parser=name)
+    client.query = url
+    client.response = html
+    if kind == 'article':
+        return (None, [client.extract_article_details()])
+    else:
+        client.extract_results()
+        return (client.total_results, client.results)
+
+def compare_parsers(html, kind='search', url='', names=('soup', 'fast')):
+    '''
+    Extract the details from a page with each of the named backends
+    and compare the output.
+    Returns a tuple -- (list of differences (empty if the backends
+    all agree), dictionary of seconds taken by each backend).
+    '''
+    outputs = {}
+    timings = {}
+    for name in names:
+        started = time.time()
+        try:
+            outputs[name] = run_parser(name, kind, html, url)
+        except Exception, error:
+            outputs[name] = 'Error: %s' % error.__class__.__name__
+        timings[name] = time.time() - started
+    differences = []
+    expected = outputs[names[0]]
+    for name in names[1:]:
+        if outputs[name] != expected:
+            differences.append(describe_difference(names[0], expected, name, outputs[name]))
+    return (differences, timings)
+
+def describe_difference(name1, output1, name2, output2):
+    if not isinstance(output1, tuple) or not isinstance(output2, tuple):
+        return '%s: %s, %s: %s' % (name1, output1, name2, output2)
+    if output1[0] != output2[0]:
+        return 'total -- %s: %r, %s: %r' % (name1, output1[0], name2, output2[0])
+    if len(output1[1]) != len(output2[1]):
+        return 'number of results -- %s: %s, %s: %s' % (name1, len(output1[1]), name2, len(output2[1]))
+    for index, (result1, result2) in enumerate(zip(output1[1], output2[1])):
+        for key in sorted(set(result1.keys() + result2.keys())):
+            if result1.get(key) != result2.get(key) or type(result1.get(key)) != type(result2.get(key)):
+                return 'result %s, %s -- %s: %r, %s: %r' % (index, key, name1, result1.get(key),
+                                                            name2, result2.get(key))
+    return 'results differ'
+
+def measure_tree(name, kind, html):
+    '''
+    Parse a page with the named backend, returning the approximate
+    number of bytes used by the tree.
+    '''
+    parser = get_parser(name)
+    if kind == 'article':
+        page = parser.parse_article(html)
+    else:
+        fragment = None
+        if name == 'fast':
+            fragment = make_fragment(html)
+        page = BeautifulSoup(fragment or html)
+    return get_tree_size(page)
+
+def get_tree_size(page):
+    '''
+    Add up the sizes of all the elements in a parse tree,
+    with their attributes.
+    '''
+    size = 0
+    stack = [page]
+    while stack:
+        element = stack.pop()
+        size += sys.getsizeof(element) + sys.getsizeof(element.__dict__)
+        if isinstance(element, Tag):
+            for attr, value in element.attrs:
+                size += sys.getsizeof(attr) + sys.getsizeof(value)
+            stack.extend(element.contents)
+    return size
+
+def find_pages(paths, kinds=('search', 'article')):
+    '''
+    Generate (name, kind, url, html) tuples for saved pages, where kind
+    is 'search', 'article' or 'page' (a newspaper page), and is one of kinds.
+    Paths can be html files, directories of html files, or response
+    cache directories.
+    '''
+    for name, kind, url, html in find_all_pages(paths):
+        if kind in kinds:
+            yield (name, kind, url, html)
+
+def find_all_pages(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    filepath = os.path.join(dirpath, filename)
+                    if filename.endswith('.json'):
+                        with open(filepath, 'rb') as meta_file:
+                            meta = json.load(meta_file)
+                        url = meta.get('url', '')
+                        if '/newspaper/result' in url:
+                            kind = 'search'
+                        elif 'nla.news-article' in url:
+                            kind = 'article'
+                        elif 'nla.news-page' in url:
+                            kind = 'page'
+                        else:
+                            continue
+                        with open('%s.body' % filepath[:-5], 'rb') as body_file:
+                            yield (url, kind, url, body_file.read())
+                    elif filename.endswith(('.html', '.htm')):
+                        yield read_page(filepath)
+        else:
+            yield read_page(path)
+
+def read_page(path):
+    with open(path, 'rb') as html_file:
+        html = html_file.read()
+    page_id = re.search(r'(\d*)', os.path.basename(path)).group(1)
+    if 'newsarticle_headline' in html:
+        return (path, 'article', 'http://nla.gov.au/nla.news-article%s' % page_id, html)
+    elif re.search(r'<ul[^>]*class=["\']?articles', html):
+        return (path, 'page', 'http://nla.gov.au/nla.news-page%s' % page_id, html)
+    elif re.search(r'<div[^>]*class=["\']?ocr-text', html):
+        return (path, 'text', '', html)
+    else:
+        return (path, 'search', '', html)
+
+def check_pages(paths, names=('soup', 'fast')):
+    '''
+    Compare the parser backends on a set of saved pages, reporting
+    any differences, and the average time taken and tree size for
+    each kind of page.
+    Returns the number of pages on which they differ.
+    '''
+    failures = 0
+    stats = {}
+    for name, kind, url, html in find_pages(paths):
+        differences, timings = compare_parsers(html, kind, url, names)
+        kind_stats = stats.setdefault(kind, {'pages': 0, 'seconds': {}, 'bytes': {}})
+        kind_stats['pages'] += 1
+        for parser in names:
+            kind_stats['seconds'][parser] = kind_stats['seconds'].get(parser, 0) + timings[parser]
+            try:
+                size = measure_tree(parser, kind, html)
+            except Exception:
+                size = 0
+            kind_stats['bytes'][parser] = kind_stats['bytes'].get(parser, 0) + size
+        if differences:
+            failures += 1
+            print 'DIFFERENT: %s' % name
+            for difference in differences:
+                print '    %s' % difference
+    for kind, kind_stats in sorted(stats.items()):
+        pages = kind_stats['pages']
+        print '%s pages: %s' % (kind, pages)
+        for parser in names:
+            print '    %s: %.1f ms, %.0f KB per page' % (parser, 
+                                                        kind_stats['seconds'][parser] * 1000 / pages,
+                                                        kind_stats['bytes'][parser] / 1024.0 / pages)
+        baseline = names[0]
+        for parser in names[1:]:
+            print '    %s saves %.1f ms, %.0f KB per page' % (parser, 
+                        (kind_stats['seconds'][baseline] - kind_stats['seconds'][parser]) * 1000 / pages,
+                        (kind_stats['bytes'][baseline] - kind_stats['bytes'][parser]) / 1024.0 / pages)
+    print '%s pages different' % failures
+    return failures
+
+def extract_text_two_pass(paras):
+    '''
+    Article text as it was extracted before records.Article built it from
+    the paragraphs, reading the spans of each paragraph twice. Kept to check
+    Article.text and Article.ftext against.
+    '''
+    ftext = ''
+    text = ''
+    for para in paras:
+        ftext += replace('<p>%s</p>' % ('').join([line.string 
+                                                  for line in para.findAll('span') 
+                                                  if line.string]).strip(),'  ',' ')
+        text += ('').join([line.string for line in 
+                           para.findAll('span') if line.string]).strip()
+    text = replace(text, '&nbsp;', ' ')
+    text = replace(text, '  ', ' ')
+    return (ftext, text)
+
+def check_text(paths):
+    '''
+    Compare the text and ftext of an Article built by scrape.extract_paras
+    (as harvests build them) with the old two-pass extraction on the
+    OCR text of every saved article page and text fixture.
+    Returns the number of texts on which they differ.
+    '''
+    import scrape
+    from records import Article
+    failures = 0
+    texts = 0
+    for name, kind, url, html in find_pages(paths, kinds=('article', 'text')):
+        for ocr_text in BeautifulSoup(html).findAll('div', 'ocr-text'):
+            texts += 1
+            paras = ocr_text.findAll('p')
+            article = Article()
+            article.set_paras(scrape.extract_paras(paras))
+            output = (article.ftext, article.text)
+            expected = tuple([text.encode('utf-8') for text in extract_text_two_pass(paras)])
+            if output != expected:
+                failures += 1
+                print 'DIFFERENT TEXT: %s' % name
+                print '    two pass: %r, single pass: %r' % (expected, output)
+    print '%s texts, %s different' % (texts, failures)
+    return failures
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [CORPUS_DIR]
+    if check_pages(paths) + check_text(paths):
+        sys.exit(1)
@@ -0,0 +1,122 @@
+'''
+ratelimit.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides token bucket rate limiting for requests to Trove.
+
+Every request made through the shared session in fetch.py waits for a
+token from the bucket belonging to its endpoint -- 'search', 'article',
+'pdf', 'api' or 'default'. Each bucket has its own rate (requests per second)
+and burst size, so time spent waiting on the server counts towards the pause
+before the next request.
+
+USAGE:
+
+Change the limits for an endpoint:
+fetch.get_session().limiter.set_limit('article', rate=2, burst=4)
+
+Or load them from the [rate-limits] section of a config file:
+ratelimit.load_config(config, fetch.get_session().limiter)
+
+[rate-limits]
+article: 2, 4
+pdf: 0.5, 1
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import threading
+import time
+
+# Requests per second and burst size for each endpoint.
+# A rate of 0 means requests to that endpoint aren't limited.
+RATE_LIMITS = {'search': (1, 1),
+               'article': (1, 5),
+               'pdf': (1, 1),
+               'api': (2, 2),
+               'default': (1, 2)}
+
+class TokenBucket:
+    '''
+    Hands out tokens at a steady rate, allowing bursts of up to burst tokens.
+    '''
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(float(burst), 1.0)
+        self.tokens = self.burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Wait until a token is available, then take it.
+        Returns the number of seconds spent waiting.
+        '''
+        waited = 0
+        if self.rate <= 0:
+            return waited
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+class RateLimiter:
+    '''
+    A set of token buckets, one for each endpoint.
+    '''
+    def __init__(self, limits=None):
+        if limits is None:
+            limits = RATE_LIMITS
+        self.buckets = {}
+        # Set to False to let every request through straight away
+        self.enabled = True
+        for endpoint, (rate, burst) in limits.items():
+            self.set_limit(endpoint, rate, burst)
+
+    def set_limit(self, endpoint, rate, burst=1):
+        self.buckets[endpoint] = TokenBucket(rate, burst)
+
+    def acquire(self, endpoint):
+        '''
+        Wait for permission to make a request to the given endpoint.
+        '''
+        bucket = self.buckets.get(endpoint, self.buckets.get('default'))
+        if bucket is None or not self.enabled:
+            return 0
+        return bucket.acquire()
+
+def load_config(config, limiter, section='rate-limits'):
+    '''
+    Set limits from a ConfigParser section with values in the form -- rate, burst.
+    '''
+    if config.has_section(section):
+        for endpoint, value in config.items(section):
+            # Skip any defaults the parser was created with
+            if endpoint in config.defaults():
+                continue
+            values = [float(num) for num in value.split(',')]
+            if len(values) == 1:
+                values.append(1)
+            limiter.set_limit(endpoint, values[0], values[1])
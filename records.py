@@ -0,0 +1,188 @@
+'''
+records.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a compact record type for the details of an article, as produced by
+TroveNewspapersClient.extract_details and extract_article_details, and by
+the API backend.
+
+Articles have fixed slots rather than a dictionary of their own, and the text
+of an article is only kept once -- as its OCR paragraphs. The text and ftext
+(the text with paragraph tags) are put together from the paragraphs whenever
+they're asked for. This makes a big difference when hundreds of thousands of
+articles are kept in memory.
+
+Articles can be used like dictionaries, so existing code (and csv.DictWriter)
+works without any changes.
+
+USAGE:
+
+article = records.Article(id='12324423', title='INCLEMENT WRAGGE')
+article['page'] = 3
+article.set_paras([u'Rain is coming.', u'So is Wragge.'])
+print article['title'], article.page, article['text']
+print article.get('summary', '')
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from string import replace
+
+# The fields an article can have, in the order they're listed
+FIELDS = ('id', 'title', 'url', 'newspaper_title', 'newspaper_details', 'newspaper_id',
+          'issue_date', 'issue_year', 'issue_month', 'issue_day', 'page', 'type',
+          'length', 'summary', 'page_url', 'tile_url', 'thumb_url', 'corrections')
+# Fields put together from the paragraphs
+TEXT_FIELDS = ('ftext', 'text')
+# Separates the paragraphs when they're stored
+PARA_SEPARATOR = '\x1e'
+
+class Article(object):
+    '''
+    The details of an article, with dictionary-style access to its fields.
+    Fields that haven't been set are missing, just as they would be from
+    a dictionary. The text fields are only present once set_paras is called.
+    '''
+    __slots__ = FIELDS + ('paras',)
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def set_paras(self, paras):
+        '''
+        Save the text of the article as a list of (unicode) paragraphs.
+        '''
+        if paras:
+            self.paras = PARA_SEPARATOR.join([para.encode('utf-8') for para in paras])
+        else:
+            self.paras = None
+
+    @property
+    def text(self):
+        '''
+        The plain text of the article, encoded as UTF-8.
+
+        >>> article = Article()
+        >>> article.set_paras([u'Clement  Wragge', u'&nbsp;Rain.'])
+        >>> article.text
+        'Clement Wragge Rain.'
+        '''
+        if self.paras is None:
+            return ''
+        text = replace(self.paras, PARA_SEPARATOR, '')
+        text = replace(text, '&nbsp;', ' ')
+        return replace(text, '  ', ' ')
+
+    @property
+    def ftext(self):
+        '''
+        The text of the article with paragraph tags, encoded as UTF-8.
+
+        >>> article = Article()
+        >>> article.set_paras([u'Clement  Wragge', u'&nbsp;Rain.'])
+        >>> article.ftext
+        '<p>Clement Wragge</p><p>&nbsp;Rain.</p>'
+        '''
+        if self.paras is None:
+            return ''
+        ftext = '<p>%s</p>' % replace(self.paras, PARA_SEPARATOR, '</p><p>')
+        return replace(ftext, '  ', ' ')
+
+    def __getitem__(self, key):
+        if key in FIELDS or key in TEXT_FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        '''
+        Returns a list of the fields that have been set.
+
+        >>> Article(title='Rain', id='1').keys()
+        ['id', 'title']
+        '''
+        return [key for key in FIELDS + TEXT_FIELDS if key in self]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        try:
+            return dict(self.items()) == dict(other.items())
+        except AttributeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def copy(self):
+        '''
+        Returns a new Article with the same fields (and text), like dict.copy.
+
+        >>> article = Article(title='Rain')
+        >>> masked = article.copy()
+        >>> masked['title'] = '****'
+        >>> article['title'], masked['title']
+        ('Rain', '****')
+        '''
+        article = Article()
+        article.__setstate__(self.__getstate__())
+        return article
+
+    def __getstate__(self):
+        return dict([(key, getattr(self, key)) for key in self.__slots__ if hasattr(self, key)])
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return 'Article(%r)' % dict(self.items())
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,341 @@
+'''
+replay.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+A local stand-in for Trove that serves responses recorded in a response
+cache directory (see cache.py), so that complete harvests and totals runs
+can be repeated and timed without going online.
+
+The server can be made to behave more like the real thing -- each response
+can be delayed, a proportion of requests can fail with a 503 error, a
+proportion of html pages can be cut short before their closing </html> tag,
+and the rate at which bodies are sent can be limited.
+
+When a command is given, the server is started, the command is run with
+every request made through fetch.py sent to the server, and the time it
+took is reported. Responses that haven't been recorded get a 404 -- unless
+the record option is used, in which case they're fetched from Trove and
+saved for next time (pdfs included).
+
+USAGE:
+
+Time a harvest against a recorded cache, with the rate limits turned off
+(do_harvest.py reads its options from config/harvest.ini):
+python replay.py -u /home/wragge/trove-cache python do_harvest.py
+
+Or give the harvest's options on the command line:
+python replay.py -u /home/wragge/trove-cache python do_harvest.py -q "http://trove.nla.gov.au/newspaper/result?q=wragge" -f /home/wragge/wragge.csv
+
+Record everything a do_totals run fetches, then replay it with some added misery:
+python replay.py -r /home/wragge/trove-cache python do_totals.py "http://trove.nla.gov.au/newspaper/result?q=wragge"
+python replay.py -l 0.5 -e 0.05 -t 0.02 -b 100000 /home/wragge/trove-cache python do_totals.py "http://..."
+
+Just run the server (set TROVE_REPLAY=http://localhost:8800 for other scripts):
+python replay.py /home/wragge/trove-cache
+
+Options:
+
+    -p (or --port) [port to listen on, default 8800]
+    -l (or --latency) [seconds to wait before each response]
+    -j (or --jitter) [up to this many seconds are added to the latency at random]
+    -e (or --error-rate) [proportion of requests that get a 503 error]
+    -t (or --truncate-rate) [proportion of html pages cut short before </html>]
+    -b (or --bandwidth) [bytes per second at which bodies are sent]
+    -s (or --seed) [seed for the random errors, so runs can be repeated exactly]
+    -r (or --record) [fetch and save responses that haven't been recorded]
+    -u (or --unlimited) [turn off the rate limits in the command]
+    -v (or --verbose) [log every request]
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import BaseHTTPServer
+import os
+import random
+import SocketServer
+import subprocess
+import sys
+import threading
+import time
+from optparse import OptionParser
+from urllib2 import HTTPError, URLError
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import cache
+import fetch
+
+PORT = 8800
+# Recorded responses never go stale
+FOREVER = 100 * 365 * cache.DAY
+# Bodies are sent in this many pieces a second when the bandwidth is limited
+SENDS_PER_SECOND = 10
+
+class ReplayServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''
+    Serves the responses in a cache directory. Request paths are
+    the original urls with the '://' replaced by '/', eg:
+    /http/trove.nla.gov.au/newspaper/result?q=wragge
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, directory, port=PORT, latency=0, jitter=0, error_rate=0,
+                 truncate_rate=0, bandwidth=0, seed=None, record=False, verbose=False):
+        BaseHTTPServer.HTTPServer.__init__(self, ('localhost', port), ReplayHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.bandwidth = bandwidth
+        self.record = record
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'served': 0, 'redirected': 0, 'missing': 0,
+                       'errors': 0, 'truncated': 0, 'recorded': 0, 'bytes': 0}
+        ttls = dict([(url_class, FOREVER) for url_class in cache.TTLS])
+        self.cache = cache.ResponseCache(directory, max_bytes=sys.maxint, ttls=ttls,
+                                         offline=not record)
+        # Recorded responses that were redirected, by the url they ended up at
+        self.redirects = find_redirects(directory)
+        if record:
+            # Used to fetch anything that hasn't been recorded
+            self.session = fetch.HTTPSession()
+
+    def get_url(self, path):
+        '''
+        Turn a request path back into the original url.
+        '''
+        parts = path.lstrip('/').split('/', 2)
+        if len(parts) < 2 or parts[0] not in ('http', 'https'):
+            return None
+        if len(parts) == 2:
+            parts.append('')
+        scheme, host, rest = parts
+        return '%s://%s/%s' % (scheme, host, rest)
+
+    def get_response(self, url):
+        '''
+        Find the recorded response for a url, recording it first if
+        necessary. Returns None if there isn't one.
+        '''
+        url_class = fetch.classify_url(url)
+        url = self.redirects.get(url, url)
+        try:
+            response = self.cache.get(url, url_class)
+        except cache.CacheMiss:
+            response = None
+        if response is None and self.record:
+            try:
+                response = self.session.get(url)
+            except (HTTPError, URLError):
+                return None
+            self.cache.put(url, response, url_class)
+            with self.lock:
+                self.counts['recorded'] += 1
+                if response.geturl() != url:
+                    self.redirects[response.geturl()] = url
+        return response
+
+    def choose(self, rate):
+        '''
+        Decide at random whether something with the given rate should happen.
+        '''
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def get_delay(self):
+        with self.lock:
+            return self.latency + self.random.random() * self.jitter
+
+    def get_cut(self, length):
+        '''
+        Choose a point in the first length characters at which to cut a page.
+        '''
+        with self.lock:
+            return self.random.randint(length / 2, length)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+class ReplayHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        delay = server.get_delay()
+        if delay:
+            time.sleep(delay)
+        url = server.get_url(self.path)
+        if url is None:
+            server.count('missing')
+            self.send_body(404, 'Not a replay url: %s' % self.path)
+            return
+        if server.choose(server.error_rate):
+            server.count('errors')
+            self.send_body(503, 'Service unavailable')
+            return
+        response = server.get_response(url)
+        if response is None:
+            server.count('missing')
+            self.send_body(404, 'Not recorded: %s' % url)
+            return
+        if response.geturl() != url:
+            # Send the client on to where the page was found
+            server.count('redirected')
+            self.send_body(302, '', [('Location', response.geturl())])
+            return
+        content = response.content
+        content_type = response.headers.getheader('content-type') or 'text/html'
+        end = content.rfind('</html>')
+        if end > 0 and server.choose(server.truncate_rate):
+            server.count('truncated')
+            content = content[:server.get_cut(end)]
+        server.count('served')
+        self.send_body(200, content, [('Content-Type', content_type)])
+
+    def send_body(self, code, content, headers=()):
+        self.send_response(code)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        bandwidth = self.server.bandwidth
+        try:
+            if bandwidth:
+                piece = max(1, int(bandwidth / SENDS_PER_SECOND))
+                for start in range(0, len(content), piece):
+                    chunk = content[start:start + piece]
+                    self.wfile.write(chunk)
+                    time.sleep(float(len(chunk)) / bandwidth)
+            else:
+                self.wfile.write(content)
+        except IOError:
+            # The client went away
+            return
+        self.server.count('bytes', len(content))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+def find_redirects(directory):
+    '''
+    Find the recorded responses that were redirected, returning
+    a dictionary of original urls keyed by the final url.
+    '''
+    redirects = {}
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith('.json'):
+                try:
+                    with open(os.path.join(dirpath, filename), 'rb') as meta_file:
+                        meta = json.load(meta_file)
+                except (IOError, ValueError):
+                    continue
+                if meta.get('final_url') and meta['final_url'] != meta['url']:
+                    redirects[meta['final_url']] = meta['url']
+    return redirects
+
+def start_server(directory, **options):
+    '''
+    Start a replay server in a background thread, returning the server.
+    '''
+    server = ReplayServer(directory, **options)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    return server
+
+def run_command(command, origin, unlimited=False):
+    '''
+    Run a command with its requests sent to the replay server at origin.
+    Returns a tuple -- (exit status, seconds taken).
+    '''
+    env = dict(os.environ)
+    env[fetch.REPLAY_ENV] = origin
+    if unlimited:
+        env[fetch.REPLAY_UNLIMITED_ENV] = '1'
+    started = time.time()
+    status = subprocess.call(command, env=env)
+    return (status, time.time() - started)
+
+def report(server):
+    counts = server.counts
+    print 'Replay: %s requests, %s served, %s redirected, %s missing, %s errors, %s truncated, %s recorded, %.1f KB sent' % (
+          counts['requests'], counts['served'], counts['redirected'], counts['missing'], counts['errors'],
+          counts['truncated'], counts['recorded'], counts['bytes'] / 1024.0)
+
+def main(argv):
+    usage = 'usage: %prog [options] cache_directory [command]'
+    parser = OptionParser(usage=usage)
+    parser.disable_interspersed_args()
+    parser.add_option('-p', '--port', dest='port', type='int', default=PORT,
+                      help='port to listen on')
+    parser.add_option('-l', '--latency', dest='latency', type='float', default=0,
+                      help='seconds to wait before each response')
+    parser.add_option('-j', '--jitter', dest='jitter', type='float', default=0,
+                      help='up to this many seconds are added to the latency at random')
+    parser.add_option('-e', '--error-rate', dest='error_rate', type='float', default=0,
+                      help='proportion of requests that get a 503 error')
+    parser.add_option('-t', '--truncate-rate', dest='truncate_rate', type='float', default=0,
+                      help='proportion of html pages cut short before </html>')
+    parser.add_option('-b', '--bandwidth', dest='bandwidth', type='int', default=0,
+                      help='bytes per second at which bodies are sent')
+    parser.add_option('-s', '--seed', dest='seed', type='int',
+                      help='seed for the random errors')
+    parser.add_option('-r', '--record', dest='record', action='store_true', default=False,
+                      help="fetch and save responses that haven't been recorded")
+    parser.add_option('-u', '--unlimited', dest='unlimited', action='store_true', default=False,
+                      help='turn off the rate limits in the command')
+    parser.add_option('-v', '--verbose', dest='verbose', action='store_true', default=False,
+                      help='log every request')
+    (options, args) = parser.parse_args(argv)
+    if not args:
+        print 'You need to supply a cache directory.'
+        sys.exit(2)
+    directory, command = args[0], args[1:]
+    server = start_server(directory, port=options.port, latency=options.latency,
+                          jitter=options.jitter, error_rate=options.error_rate,
+                          truncate_rate=options.truncate_rate, bandwidth=options.bandwidth,
+                          seed=options.seed, record=options.record, verbose=options.verbose)
+    origin = 'http://localhost:%s' % options.port
+    if not command:
+        print 'Replaying %s at %s -- press Ctrl-C to stop' % (directory, origin)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        report(server)
+        return
+    status, seconds = run_command(command, origin, options.unlimited)
+    server.shutdown()
+    print 'Command finished in %.2f seconds with exit status %s' % (seconds, status)
+    report(server)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
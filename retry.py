@@ -0,0 +1,158 @@
+'''
+retry.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides the retry policy used by all the Trove fetchers.
+
+Failed requests are retried with an exponentially increasing, jittered
+delay, so that workers that fail together don't all retry together.
+If the server sends a Retry-After header, we wait at least that long.
+A policy gives up once it runs out of tries or time.
+
+Every attempt is recorded in a shared log, with its latency and outcome.
+
+USAGE:
+
+policy = retry.RetryPolicy(tries=10)
+response = policy.call(fetch.get_url, 'http://nla.gov.au/nla.news-article12324423')
+
+print retry.LOG.summary()
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import collections
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+from urllib2 import HTTPError, URLError
+
+from fetch import ServerError
+
+class AttemptLog:
+    '''
+    Keeps the most recent attempts, and running totals for each outcome.
+    '''
+    def __init__(self, size=1000):
+        self.attempts = collections.deque(maxlen=size)
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def record(self, url, attempt, latency, outcome):
+        with self.lock:
+            self.attempts.append({'url': url, 'attempt': attempt,
+                                  'latency': latency, 'outcome': outcome})
+            count, total_latency = self.totals.get(outcome, (0, 0))
+            self.totals[outcome] = (count + 1, total_latency + latency)
+
+    def summary(self):
+        '''
+        Return the number of attempts and their average latency for each outcome.
+        '''
+        with self.lock:
+            return dict((outcome, {'attempts': count, 'latency': total_latency / count})
+                        for outcome, (count, total_latency) in self.totals.items())
+
+LOG = AttemptLog()
+
+class RetryPolicy:
+    '''
+    Exponential backoff with jitter, limited by number of tries and elapsed time.
+    '''
+    def __init__(self, tries=10, base_delay=1.0, max_delay=60.0, max_elapsed=900.0, log=None):
+        self.tries = tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        if log is None:
+            log = LOG
+        self.log = log
+
+    def delay(self, attempt, retry_after=None):
+        '''
+        Calculate how long to wait after the given attempt.
+        Half the delay is fixed, the other half is random.
+        '''
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if retry_after:
+            delay = max(delay, retry_after)
+        return delay
+
+    def call(self, func, url):
+        '''
+        Call func(url), retrying any temporary failures.
+        Returns the result of func, or raises the last error.
+        '''
+        started = time.time()
+        attempt = 1
+        while True:
+            attempt_started = time.time()
+            try:
+                result = func(url)
+            except Exception, error:
+                self.log.record(url, attempt, time.time() - attempt_started, describe(error))
+                if not is_retryable(error) or attempt >= self.tries:
+                    raise
+                delay = self.delay(attempt, get_retry_after(error))
+                if time.time() - started + delay > self.max_elapsed:
+                    raise
+                print 'Try number %s failed (%s). Trying again in %.1f seconds...' % (attempt, error, delay)
+                time.sleep(delay)
+                attempt += 1
+            else:
+                self.log.record(url, attempt, time.time() - attempt_started, 'ok')
+                return result
+
+def is_retryable(error):
+    '''
+    Server errors, rate limiting and network problems are worth retrying.
+    '''
+    if isinstance(error, HTTPError):
+        return error.code >= 500 or error.code == 429
+    return isinstance(error, (ServerError, URLError))
+
+def describe(error):
+    '''
+    A short label for the outcome of a failed attempt, eg. 'HTTP 503'.
+    '''
+    for err in (error,) + tuple(getattr(error, 'args', ())):
+        if isinstance(err, HTTPError):
+            return 'HTTP %s' % err.code
+    return error.__class__.__name__
+
+def get_retry_after(error):
+    '''
+    Find a Retry-After header (in seconds or as a date) attached to
+    an error, or an error wrapped by a ServerError.
+    '''
+    for err in (error,) + tuple(getattr(error, 'args', ())):
+        headers = getattr(err, 'hdrs', None)
+        if headers is None:
+            continue
+        value = headers.getheader('Retry-After')
+        if not value:
+            continue
+        try:
+            return max(0, int(value))
+        except ValueError:
+            date = parsedate_tz(value)
+            if date:
+                return max(0, mktime_tz(date) - time.time())
+    return None
@@ -11,21 +11,27 @@ Initialise client:
 client = retrieve.TroveNewspapersClient()
 
 Do a basic search:
-client.search(q=clement+wragge&)
+result = client.search(q=clement+wragge&)
 
 Find out the number of results:
-total_results = client.total_results
+total_results = result.total
 
 Retrieve search results:
-results = client.results
+results = result.results
 
 Retrieve details of an individual article:
-client.get_article('12324423')
-results = client.results
+article = client.get_article('12324423')
 
 Get random articles from 1945:
-client.get_random(year=1945)
-results = client.results
+result = client.get_random(year=1945)
+results = result.results
+
+Each request returns its results, so a single client can be used
+from many threads at once. The results of the last request are also
+left in client.query, client.response, client.total_results and
+client.results, as they were in earlier versions. If the client is
+shared between threads, these hold whichever request finished last --
+so threads should only use the values that are returned to them.
 
 Copyright (C) 2011 Tim Sherratt
 This file is part of the TroveNewspapers package.
@@ -44,16 +50,21 @@ You should have received a copy of the GNU General Public License
 along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
 '''
 from BeautifulSoup import BeautifulSoup
+from collections import namedtuple
 import re
 import random
-from urllib2 import Request, urlopen, URLError, HTTPError
-import urllib2
+from urllib2 import URLError, HTTPError
 from time import sleep
 from urllib import quote_plus
-from string import replace
-import time
 
+import dates
+import fetch
+import parsers
+import retry
+from fetch import ServerError
+from records import Article
 from utilities import open_titles
+from workers import ordered_map
 
 SEARCH_PATH = "http://trove.nla.gov.au/newspaper/result?"
 IMAGE_PATH = "http://trove.nla.gov.au/ndp/imageservice/nla.news-page"
@@ -61,9 +72,16 @@ TROVE_URL = 'http://trove.nla.gov.au'
 STATES = ['nsw', 'act', 'nt', 'qld', 'sa', 'tas', 'vic', 'wa', 'national']
 SORT_OPTIONS = ['', 'dateAsc', 'dateDesc']
 
+class SearchResult(namedtuple('SearchResult', 'total results query')):
+    '''
+    The outcome of a search -- the total number of matching articles
+    (an int), a tuple of results from the page, and the url of the page.
+    '''
+    __slots__ = ()
+
 class TroveNewspapersClient:
     
-    def __init__(self, titles=True):
+    def __init__(self, titles=True, parser=None):
         if titles:
             self.titles_by_state = open_titles('state')
             self.titles_by_id = open_titles('id')
@@ -75,6 +93,8 @@ class TroveNewspapersClient:
         self.results = []
         self.total_results = 0
         self.tries = 1
+        # Backend used to extract results from search pages, see parsers.py
+        self.parser = parsers.get_parser(parser)
         
     def reset(self):
         self.query = ''
@@ -123,22 +143,22 @@ class TroveNewspapersClient:
                 dateDesc
             s (start number)
                 (a multiple of 20)
+        Or supply the url of a results page as url.
+        The number of tries can also be set for this request as tries
+        (the default is self.tries).
+        Returns a SearchResult.
         '''
+        tries = kwargs.pop('tries', None)
         if 'url' in kwargs:
-            self.query = kwargs['url']
-        else:
-            self.make_query(**kwargs)
-        #print self.query
-        try:
-            self.try_url()
-        except Exception:
-            raise
+            query = kwargs['url']
         else:
-            try:
-                self.extract_results()
-            except Exception:
-                #print self.response
-                raise
+            query = self.build_query(**kwargs)
+        response = self.fetch_page(query, tries)
+        total, results = self.parser.parse_results(response, self.extract_details)
+        # Kept for code that reads the results from the client
+        self.query, self.response = query, response
+        self.total_results, self.results = total, results
+        return SearchResult(int(total), tuple(results), query)
         
     def get_random_articles(self, year=None, 
                                 state=None, 
@@ -148,7 +168,8 @@ class TroveNewspapersClient:
                                 kw_exact=None, 
                                 kw_exclude=None, 
                                 filters=None, 
-                                mask=False):
+                                mask=False,
+                                tries=None):
         '''
         Retrieve a random set of results.
         The 'randomness' can be adjusted and the content filtered by supplying parameters.
@@ -158,7 +179,7 @@ class TroveNewspapersClient:
         get_random_articles(year="1920", q="cricket") -- will return random results from 1920 containing the keyword 'cricket'.
         get_random_articles(titles=["112"]) -- will return random results from the Australian Women's Weekly
         
-        Sets self.results to a list of dictionaries, each containing:
+        Returns a SearchResult whose results are Article records, each containing:
         
             'title': article title,
             'id': article id number (can be used in get_article to retrieve further details)
@@ -185,15 +206,17 @@ class TroveNewspapersClient:
                                                 titles=titles, filters=filters)
         parameters['sortby'] = random.choice(SORT_OPTIONS)
         parameters['l-category'] = 'Article|category:Article'
-        self.search(**parameters)
+        result = self.search(tries=tries, **parameters)
         if mask: 
-            self.mask_dates(year)
+            result = result._replace(results=tuple(self.mask_dates(year, result.results)))
+            self.results = list(result.results)
+        return result
     
-    def get_article(self, article_id):
+    def get_article(self, article_id, tries=None):
         '''
         Get the details of a specific article using its ID.
         Example: get_article('13855894').
-        Returns a dictionary:
+        Returns an Article record containing:
             'title': article title,
             'id': article id number (can be used in get_article to retrieve further details)
             'url': url of article
@@ -207,23 +230,28 @@ class TroveNewspapersClient:
             'corrections': number of OCR corrections made
             'text': text of article            
         '''
-        self.query = 'http://nla.gov.au/nla.news-article%s' % article_id
-        try:
-            self.try_url()
-        except Exception:
-            raise
-        else:
-            self.results = self.extract_article_details()
+        url = 'http://nla.gov.au/nla.news-article%s' % article_id
+        response = self.fetch_page(url, tries)
+        article = self.extract_article_details(response, url)
+        # Kept for code that reads the results from the client
+        self.query, self.response, self.results = url, response, article
+        return article
             
     def make_query(self, **kwargs):
         '''
         Create search query from supplied parameters.
         '''
+        self.query = self.build_query(**kwargs)
+
+    def build_query(self, **kwargs):
+        '''
+        Returns the url of a search using the supplied parameters.
+        '''
         url = SEARCH_PATH
         kwargs = self.process_args(**kwargs)
         url += '&'.join(['%s=%s' % (k.replace('_','-'), quote_plus(v,'*+|&=')) 
                                     for (k, v) in kwargs.items()])
-        self.query = url
+        return url
 
     def process_args(self, **kwargs):
         '''
@@ -351,19 +379,14 @@ class TroveNewspapersClient:
         Extracts individual results from results page and 
         sends them off for processing.
         '''
-        page = BeautifulSoup(self.response)
-        self.total_results = (page.find('div', attrs={'id': 'newspapers'})
-                                        .find('div', 'hdrresult')
-                                        .p.strong.string.strip().replace(',',''))
-        self.results = [self.extract_details(result) 
-                        for result in page.find('div', {'id': 'newspapers'})
-                                                .findAll('dl')]
+        self.total_results, self.results = self.parser.parse_results(self.response, 
+                                                                     self.extract_details)
     
     def extract_details(self, result):
         '''
         Extracts details of each individual result.
         '''
-        article = {}
+        article = Article()
         if result.dt.a is not None:
             if result.dt.a.string.strip() == '[coming soon]':
                 title = result.dt.contents[0].string.strip()
@@ -414,14 +437,17 @@ class TroveNewspapersClient:
         
         return article
         
-    def extract_article_details(self):
+    def extract_article_details(self, html=None, url=None):
         '''
-        Extract the details from an individual article page.
+        Extract the details from an individual article page
+        (by default, the page in self.response).
         '''
-        article = {}
-        page = BeautifulSoup(self.response)
-        article['id'] = self.query[34:]
-        article['url'] = self.query
+        if html is None:
+            html, url = self.response, self.query
+        article = Article()
+        page = self.parser.parse_article(html)
+        article['id'] = url[34:]
+        article['url'] = url
         article['title'] = (page.find(attrs = {'name': 'newsarticle_headline'})['content']
                                     .encode('utf-8'))
         if '(' in page.find('div','title').h1.string:
@@ -439,7 +465,7 @@ class TroveNewspapersClient:
         article['issue_year'], article['issue_month'], article['issue_day'] = extract_date(article['issue_date'])
         article['page'] = (page.find('select', attrs = {'name': 'id'})
                             .find('option', attrs = {'selected': 'selected'}).string.strip())
-        page_id = re.search(r'var pageId = \'(\d+)\'', self.response).group(1)
+        page_id = re.search(r'var pageId = \'(\d+)\'', html).group(1)
         article['page_url'] = 'http://nla.gov.au/nla.news-page' + page_id
         article['tile_url'] = '%s%s/tile0-0-0' % (IMAGE_PATH, page_id)
         article['thumb_url'] = '%s%s/thumb' % (IMAGE_PATH, page_id)
@@ -449,92 +475,114 @@ class TroveNewspapersClient:
             article['corrections'] = int(re.match('^(\d+)', 
                                                   page.find('p', 'numCorrections')
                                                   .contents[0].strip()).group(1))
-        paras = page.find('div', 'ocr-text').findAll('p')
-        ftext = ''
-        text = ''
-        for para in paras:
-            ftext += replace('<p>%s</p>' % ('').join([line.string 
-                                                      for line in para.findAll('span') 
-                                                      if line.string]).strip(),'  ',' ')
-            text += ('').join([line.string for line in 
-                               para.findAll('span') if line.string]).strip()
-        text = replace(text, '&nbsp;', ' ')
-        text = replace(text, '  ', ' ')
-        article['ftext'] = ftext.encode('utf-8')
-        article['text'] = text.encode('utf-8')
+        # The text and ftext are put together from the paragraphs when needed
+        article.set_paras(extract_paras(page.find('div', 'ocr-text').findAll('p')))
         return article
     
-    def extract_page_articles(self, page_url):
+    def extract_page_articles(self, page_url, workers=1):
         '''
         Extract details of all articles on a page.
+        Up to workers articles are retrieved at the same time.
+        Returns a list of the articles in page order (they're
+        also added to self.results).
         '''
-        self.query = page_url
-        try:
-            self.try_url()
-        except Exception:
-            raise
-        page = BeautifulSoup(self.response)
-        articles = page.find('ul', 'articles').findAll('li')
-        for article in articles:
-            self.query = TROVE_URL + article.h4.a['href']
-            try:
-                self.try_url()
-            except Exception:
-                raise
+        articles, error = self.extract_pages_articles([page_url], workers)[0]
+        if error:
+            raise error
+        self.results.extend(articles)
+        return articles
+
+    def extract_pages_articles(self, page_urls, workers=1):
+        '''
+        Extract details of all articles on a list of pages, retrieving
+        up to workers pages or articles at the same time.
+        Returns a list of (articles, error) tuples in the same order
+        as page_urls. If any of a page's articles can't be retrieved,
+        articles is None and error is the first error.
+        '''
+        pages = ordered_map(self.get_page_article_urls, page_urls, workers)
+        article_urls = []
+        for urls, error in pages:
+            if urls:
+                article_urls.extend(urls)
+        articles = iter(ordered_map(self.get_article_from_url, article_urls, workers))
+        results = []
+        for urls, error in pages:
+            if error:
+                results.append((None, error))
+                continue
+            outcomes = [articles.next() for url in urls]
+            errors = [error for article, error in outcomes if error]
+            if errors:
+                results.append((None, errors[0]))
             else:
-                self.results.append(self.extract_article_details())
+                results.append(([article for article, error in outcomes], None))
+        return results
+
+    def get_page_article_urls(self, page_url):
+        '''
+        List the urls of all the articles on a page.
+        '''
+        page = BeautifulSoup(self.fetch_page(page_url))
+        articles = page.find('ul', 'articles').findAll('li')
+        return [TROVE_URL + article.h4.a['href'] for article in articles]
+
+    def get_article_from_url(self, article_url):
+        '''
+        Retrieve and extract the details of an article.
+        '''
+        return self.extract_article_details(self.fetch_page(article_url), article_url)
     
-    def mask_dates(self, year):
+    def mask_dates(self, year, results=None):
         '''
-        Hide dates in headlines and summaries.
+        Returns copies of the results with the dates hidden in their
+        headlines and summaries -- the results themselves are left as
+        they are, so they can be shared. By default the results in
+        self.results are masked, and replaced by the copies.
         '''
         pattern = re.compile(r'\b%s\b' % year)
-        for result in self.results:
+        masked = []
+        for result in (self.results if results is None else results):
+            result = result.copy()
             result['title'] = pattern.sub(' **** ', result['title'])
-            result['summary'] = pattern.sub(' **** ', result['summary'])                 
+            result['summary'] = pattern.sub(' **** ', result['summary'])
+            masked.append(result)
+        if results is None:
+            self.results = masked
+        return masked
 
     def try_url(self):
         '''
-        Set up a loop to retry downloads in the case of server (5xx) errors.
+        Retrieve the page at self.query, retrying server (5xx) errors
+        and incomplete pages according to the shared retry policy.
         '''
-        success = False
-        try_num = 1
-        while success is False and try_num <= self.tries:
-            response = None
-            content = None
-            print 'Try number: %s ' % try_num
-            if try_num > 1:
-                time.sleep(10)
-            try:
-                response = self.get_url()
-            except ServerError:
-                if try_num < self.tries:
-                    try_num += 1
-                    continue
-                else:
-                    raise
-            except Exception:
-                raise
-            content= response.read()
-            # Make sure a complete page is returned
-            if content and re.search(r'<\/html>', content):
-                self.response = content
-                success = True
-            else:
-                if try_num == self.tries:
-                    raise ServerError('Nothing was returned')
-                else:
-                    try_num += 1
+        self.response = self.fetch_page(self.query)
+
+    def fetch_page(self, url, tries=None):
+        '''
+        Returns the content of the page at url, retrying server (5xx)
+        errors and incomplete pages up to tries (default self.tries) times.
+        '''
+        policy = retry.RetryPolicy(tries=tries or self.tries)
+        return policy.call(self.get_page, url)
+
+    def get_page(self, url):
+        '''
+        Retrieve page content, making sure a complete page is returned.
+        '''
+        content = self.get_url(url).read()
+        if not (content and re.search(r'<\/html>', content)):
+            # Make sure the incomplete page isn't served again from the cache
+            fetch.get_session().forget(url)
+            raise ServerError('Nothing was returned')
+        return content
         
-    def get_url(self):
+    def get_url(self, url=None):
         '''
-        Retrieve page.
+        Retrieve page (by default, self.query) using the shared keep-alive session.
         '''
-        user_agent = 'Mozilla/5.0 (X11; Linux i686; rv:2.0.1) Gecko/20100101 Firefox/4.0.1'
-        headers = { 'User-Agent' : user_agent }
-        req = Request(self.query, None, headers)
         try:
-            response = urlopen(req)
+            response = fetch.get_url(url or self.query)
         except HTTPError, error:
             if error.code >= 500:
                 raise ServerError(error)
@@ -544,19 +592,29 @@ class TroveNewspapersClient:
             raise
         return response
 
+def extract_paras(paras):
+    '''
+    Collect the text of each of an article's OCR paragraphs.
+
+    >>> page = BeautifulSoup('<div><p><span>Clement  </span><span>Wragge</span></p><p><span>&nbsp;Rain.</span><span></span></p></div>')
+    >>> extract_paras(page.findAll('p'))
+    [u'Clement  Wragge', u'&nbsp;Rain.']
+
+    The formatted and plain text are built from the paragraphs by Article:
+
+    >>> article = Article()
+    >>> article.set_paras(extract_paras(page.findAll('p')))
+    >>> (article.ftext, article.text)
+    ('<p>Clement Wragge</p><p>&nbsp;Rain.</p>', 'Clement Wragge Rain.')
+    '''
+    return [''.join([span.string for span in para.findAll('span') if span.string]).strip()
+            for para in paras]
+
 def extract_date(date_string):
     '''
     Extracts year, month and day integers from issue date string.
     '''
-    cleaned_date = re.match('^(\w+ \d{1,2} \w+ \d{4})', date_string).group(1)
-    date_tuple = time.strptime(cleaned_date, '%A %d %B %Y')
-    year = date_tuple[0]
-    month = date_tuple[1]
-    day = date_tuple[2]
-    return (year, month, day)
-
-class ServerError(Exception):
-    pass
+    return dates.parse_issue_date(date_string)
 
 if __name__ == "__main__":
     #Examples
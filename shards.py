@@ -0,0 +1,138 @@
+'''
+shards.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Splits a Trove newspapers search into shards -- disjoint date windows
+that can be harvested in parallel without paging deep into a single
+result set.
+
+The full date range of the query is split in half, month-wise, until every
+window holds no more than max_results articles (or is a single month).
+Windows with no results are dropped. If the query has no start (or end) date,
+the first (or last) window is left open at that end, so no articles fall
+outside the windows. The windows are checked against the total for the full
+query, and a warning is printed if they don't add up.
+
+USAGE:
+
+plans = shards.plan_shards('http://trove.nla.gov.au/newspaper/result?q=wragge', max_results=2000)
+for plan in plans:
+    print plan['query'], plan['total']
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+import re
+import datetime
+
+import api
+import scrape
+
+FIRST_YEAR = 1803
+LAST_YEAR = datetime.date.today().year
+MAX_RESULTS = 2000
+
+def plan_shards(query, max_results=MAX_RESULTS, backend='html', api_key=None):
+    '''
+    Split a query into date windows of no more than max_results articles.
+    Returns a list of dictionaries, in date order, each containing:
+        'query': the search url for the window
+        'total': the number of results in the window
+        'start': (year, month) of the start of the window
+        'end': (year, month) of the end of the window
+    '''
+    if backend == 'api':
+        client = api.TroveApiClient(key=api_key or api.TROVE_KEY)
+        def count(window_query):
+            return client.search(api.make_api_params(window_query), n=0)[0]
+    else:
+        news = scrape.TroveNewspapersClient(titles=False)
+        def count(window_query):
+            return news.search(url=window_query, tries=10).total
+    full_total = count(query)
+    bounds = get_date_bounds(query)
+    base_query = remove_dates_from_query(query)
+    start = month_number(bounds['fromyyyy'] or FIRST_YEAR, bounds['frommm'] or 1)
+    end = month_number(bounds['toyyyy'] or LAST_YEAR, bounds['tomm'] or 12)
+    plans = []
+    windows = [(start, end)]
+    while windows:
+        first, last = windows.pop(0)
+        window_query = make_window_query(base_query, first, last, start, end, bounds)
+        total = count(window_query)
+        print 'Planning %s to %s: %s results' % (format_month(first), format_month(last), total)
+        if total == 0:
+            continue
+        if total <= max_results or first == last:
+            plans.append({'query': window_query, 'total': total,
+                          'start': month_tuple(first), 'end': month_tuple(last)})
+        else:
+            middle = (first + last) / 2
+            windows[0:0] = [(first, middle), (middle + 1, last)]
+    planned = sum([plan['total'] for plan in plans])
+    if planned != full_total:
+        print 'Warning: the query has %s results, but the shards only hold %s' % (full_total, planned)
+    return plans
+
+def get_date_bounds(query):
+    '''
+    Find the date limits in a query. Any that aren't set are None.
+    '''
+    bounds = {}
+    for param in ['fromyyyy', 'frommm', 'fromdd', 'toyyyy', 'tomm', 'todd']:
+        match = re.search(r'&%s=(\d+)' % param, query)
+        if match:
+            bounds[param] = int(match.group(1))
+        else:
+            bounds[param] = None
+    return bounds
+
+def remove_dates_from_query(query):
+    '''
+    Strip any existing date parameters from the query string.
+    '''
+    patterns = ['&fromdd=*\d{0,2}', '&frommm=*\d{0,2}', '&fromyyyy=*\d{0,4}',
+                '&todd=*\d{0,2}', '&tomm=*\d{0,2}', '&toyyyy=*\d{0,4}']
+    for pattern in patterns:
+        query = re.sub(pattern, '', query)
+    return query
+
+def make_window_query(base_query, first, last, start, end, bounds):
+    '''
+    Add the dates for a window to a query. Windows at either end of the
+    full range keep any day limits set in the original query -- or are left
+    open at that end if the original query doesn't set a year there.
+    '''
+    window_query = base_query
+    if first != start or bounds['fromyyyy']:
+        window_query += '&fromyyyy=%s&frommm=%02d' % month_tuple(first)
+        if first == start and bounds['fromdd']:
+            window_query += '&fromdd=%02d' % bounds['fromdd']
+    if last != end or bounds['toyyyy']:
+        window_query += '&toyyyy=%s&tomm=%02d' % month_tuple(last)
+        if last == end and bounds['todd']:
+            window_query += '&todd=%02d' % bounds['todd']
+    return window_query
+
+def month_number(year, month):
+    return int(year) * 12 + int(month) - 1
+
+def month_tuple(number):
+    return (number / 12, number % 12 + 1)
+
+def format_month(number):
+    return '%s-%02d' % month_tuple(number)
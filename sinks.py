@@ -0,0 +1,778 @@
+'''
+sinks.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides the places a harvest can save the details of articles -- a CSV
+file, a JSON Lines file, an SQLite database and Parquet files.
+
+Each kind of sink has the same methods:
+
+    write(article) -- save an article (or a row read back from the CSV file)
+    checkpoint() -- make sure everything written so far is safe on disk
+    full() -- True if the sink is holding as much as it should before a checkpoint
+    get_ids() -- the ids of the articles already saved (or None if it can't tell)
+    close()
+
+The harvester only adds the ids of articles to its journal after a
+checkpoint, so if a harvest is killed, anything that wasn't checkpointed
+is harvested again when it's resumed.
+
+CSVSink and JSONLinesSink keep the rows they're given in a buffer, and only
+write them to their files at a checkpoint. The size of the file after each
+checkpoint is saved in a checkpoint file (eg. inclement_csv_checkpoint.txt),
+and anything written after the last checkpoint is cut off when the file is
+reopened -- so a killed harvest never leaves a half-written row, or a row
+that will be written again. The JSON Lines file can be compressed with
+gzip, or with zstd (pip install zstandard). Each checkpoint adds a complete
+gzip member (or zstd frame) to the file, so it can be read with zcat, or
+with pandas.read_json(path, lines=True). Each record has the same fields
+as the CSV file (less ftext, if it's left out), typed the same way as the
+columns of the database -- ids, pages and corrections are numbers, and issue
+dates are YYYY-MM-DD -- whether the article was just harvested or read back
+from the CSV file.
+
+SQLiteSink saves articles in an SQLite database. The details of each
+article go in the articles table, which is indexed by newspaper and date,
+and the title and text go in a full-text index (FTS5, or FTS4 if that's
+all your version of SQLite has). Searching a harvest of a million articles
+takes milliseconds rather than a read through the whole CSV. If your SQLite
+has no full-text search at all, the texts are saved in an ordinary table
+and searched more slowly.
+
+Rows are inserted in batches, each batch in a single transaction. If a
+harvest is killed, the last batch is lost -- but the harvester puts back
+any articles that are in the CSV file and not in the database when the
+harvest is resumed.
+
+USAGE:
+
+sink = sinks.JSONLinesSink('/home/wragge/inclement.jsonl.gz', 
+                           '/home/wragge/inclement_jsonl_checkpoint.txt', 
+                           compression='gzip', ftext=False)
+sink.write(article)
+sink.checkpoint()
+sink.close()
+for record in sinks.read_jsonl('/home/wragge/inclement.jsonl.gz'):
+    print record['id'], record['title']
+
+sink = sinks.SQLiteSink('/home/wragge/inclement.db')
+sink.write(article)
+sink.close()
+
+Search the database:
+sink = sinks.SQLiteSink('/home/wragge/inclement.db')
+for row in sink.search('NEAR(wragge cyclone)', newspaper_id=13, start_date='1900-01-01'):
+    print row['id'], row['issue_date'], row['title']
+
+Or from the command line:
+python sinks.py /home/wragge/inclement.db "NEAR(wragge cyclone)"
+
+The search words use the query syntax of the full-text module the database
+was created with (sink.fts). The examples above are for FTS5 -- with FTS4,
+the same search is written "wragge NEAR cyclone". Both accept plain words,
+"quoted phrases", OR and prefixes like wrag*. Without full-text search,
+the words are matched as a single string.
+
+ParquetSink saves articles in a directory of Parquet files, which can be
+loaded straight into a dataframe -- eg. pandas.read_parquet(path). The
+columns are typed (ids, pages and corrections are integers, and issue dates
+are dates), and the text of the articles is kept in the last column. Each
+column is stored separately, so loading or filtering only the details of
+articles never touches their texts:
+
+pandas.read_parquet('/home/wragge/inclement_parquet', columns=['id', 'issue_date'])
+
+Articles are written in groups of 10,000 rows. A file is only readable once
+it's finished, so a new file is started every 100,000 articles, and the file
+being written has a .tmp suffix. A file that was never finished is removed,
+and its articles are put back from the CSV file, when a harvest is resumed.
+Parquet files need pyarrow (pip install pyarrow).
+
+sink = sinks.ParquetSink('/home/wragge/inclement_parquet')
+sink.write(article)
+sink.close()
+
+Read the ids and correction counts from an earlier harvest's CSV file,
+JSON Lines file or database (used for incremental harvests):
+corrections = sinks.read_corrections('/home/wragge/inclement.csv')
+
+Convert the CSV file of an existing harvest:
+python sinks.py --parquet /home/wragge/inclement.csv
+python sinks.py --database /home/wragge/inclement.csv
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import csv
+import datetime
+import glob
+import gzip
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from cStringIO import StringIO
+from optparse import OptionParser
+try:
+    import json
+except ImportError:
+    import simplejson as json
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import dates
+
+# The columns of the CSV file
+CSV_FIELDS = ['id', 'title', 'url', 'newspaper_title', 'newspaper_details', 'newspaper_id',
+              'issue_date', 'page', 'page_url', 'corrections', 'ftext', 'text']
+
+# Bytes of rows held by a file sink between checkpoints
+MAX_BUFFER = 4 * 1024 * 1024
+# Extensions of JSON Lines files with each kind of compression
+JSONL_EXTENSIONS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst', None: '.jsonl'}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Bytes read at a time from a JSON Lines file
+READ_SIZE = 64 * 1024
+# Number of articles inserted in each transaction
+BATCH_SIZE = 500
+# Full-text index modules, best first
+FTS_MODULES = ('fts5', 'fts4')
+
+ARTICLES_TABLE = '''CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    url TEXT,
+    newspaper_title TEXT,
+    newspaper_details TEXT,
+    newspaper_id INTEGER,
+    issue_date TEXT,
+    page INTEGER,
+    page_url TEXT,
+    corrections INTEGER)'''
+INDEXES = ['CREATE INDEX IF NOT EXISTS articles_newspaper ON articles (newspaper_id, issue_date)',
+           'CREATE INDEX IF NOT EXISTS articles_date ON articles (issue_date)']
+ARTICLE_COLUMNS = ('id', 'title', 'url', 'newspaper_title', 'newspaper_details', 'newspaper_id',
+                   'issue_date', 'page', 'page_url', 'corrections')
+# Number of articles in each Parquet row group
+ROW_GROUP_SIZE = 10000
+# Number of articles in each Parquet file
+ROWS_PER_FILE = 100000
+TEMP_SUFFIX = '.tmp'
+
+class Sink:
+    '''
+    Somewhere the details of harvested articles are saved.
+    '''
+    def write(self, article):
+        raise NotImplementedError
+
+    def checkpoint(self):
+        pass
+
+    def full(self):
+        return False
+
+    def get_ids(self):
+        return None
+
+    def close(self):
+        self.checkpoint()
+
+class FileSink(Sink):
+    '''
+    Saves rows to a file, keeping them in a buffer until the next checkpoint.
+    Subclasses turn an article into a row with format_row.
+    Safe to use from multiple threads.
+    '''
+    def __init__(self, path, checkpoint_path, max_buffer=MAX_BUFFER):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.max_buffer = max_buffer
+        self.buffer = []
+        self.buffered = 0
+        self.lock = threading.Lock()
+        self.truncate_to_checkpoint()
+        self.out = open(path, 'ab')
+        self.checkpoints = open(checkpoint_path, 'ab')
+        self.save_size()
+
+    def truncate_to_checkpoint(self):
+        '''
+        Cut off anything written to the file after the last checkpoint.
+        '''
+        if not os.path.exists(self.path) or not os.path.exists(self.checkpoint_path):
+            return
+        size = None
+        with open(self.checkpoint_path, 'rb') as checkpoint_file:
+            for line in checkpoint_file:
+                # A partly written last line is ignored
+                if line.endswith('\n'):
+                    size = int(line)
+        if size is not None and os.path.getsize(self.path) > size:
+            print 'Removed %s bytes written to %s after the last checkpoint' % (
+                  os.path.getsize(self.path) - size, self.path)
+            with open(self.path, 'r+b') as out:
+                out.truncate(size)
+
+    def save_size(self):
+        self.checkpoints.write('%s\n' % os.fstat(self.out.fileno()).st_size)
+        self.checkpoints.flush()
+
+    def write(self, article):
+        row = self.format_row(article)
+        with self.lock:
+            self.buffer.append(row)
+            self.buffered += len(row)
+
+    def full(self):
+        return self.buffered >= self.max_buffer
+
+    def checkpoint(self):
+        '''
+        Write the buffered rows to the file, and save its new size.
+        '''
+        with self.lock:
+            if not self.buffer:
+                return
+            self.out.write(self.encode(''.join(self.buffer)))
+            self.out.flush()
+            os.fsync(self.out.fileno())
+            self.buffer = []
+            self.buffered = 0
+            self.save_size()
+
+    def encode(self, data):
+        return data
+
+    def close(self):
+        self.checkpoint()
+        with self.lock:
+            self.out.close()
+            self.checkpoints.close()
+
+class CSVSink(FileSink):
+    '''
+    Saves articles as rows of a CSV file. If ftext is False,
+    the ftext column is left empty.
+    '''
+    def __init__(self, path, checkpoint_path, ftext=True, max_buffer=MAX_BUFFER):
+        FileSink.__init__(self, path, checkpoint_path, max_buffer)
+        self.ftext = ftext
+
+    def format_row(self, article):
+        values = [article.get(field, '') for field in CSV_FIELDS]
+        if not self.ftext:
+            values[CSV_FIELDS.index('ftext')] = ''
+        row = StringIO()
+        csv.writer(row, dialect=csv.excel).writerow(values)
+        return row.getvalue()
+
+class JSONLinesSink(FileSink):
+    '''
+    Saves each article as a line of JSON, in a file compressed
+    with gzip or zstd (or not compressed if compression is None).
+    '''
+    def __init__(self, path, checkpoint_path, compression='gzip', ftext=True, max_buffer=MAX_BUFFER):
+        if compression not in JSONL_EXTENSIONS:
+            raise ValueError('Unknown compression: %s' % compression)
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError('Compressing with zstd needs zstandard -- pip install zstandard')
+        FileSink.__init__(self, path, checkpoint_path, max_buffer)
+        self.compression = compression
+        self.ftext = ftext
+
+    def format_row(self, article):
+        return '%s\n' % json.dumps(make_record(article, self.ftext))
+
+    def encode(self, data):
+        '''
+        Compress the rows of a checkpoint as a complete gzip member or zstd frame.
+        '''
+        if self.compression == 'gzip':
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            return compressor.compress(data) + compressor.flush()
+        elif self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        return data
+
+    def get_ids(self):
+        '''
+        Returns a set of the ids of the articles in the file (as strings).
+        '''
+        with self.lock:
+            self.out.flush()
+            return set([str(record['id']) for record in read_jsonl(self.path)])
+
+class SQLiteSink(Sink):
+    '''
+    Saves articles in an SQLite database with a full-text index of their texts.
+    Safe to use from multiple threads.
+    '''
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.unsaved = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(ARTICLES_TABLE)
+        for index in INDEXES:
+            self.db.execute(index)
+        self.fts = self.create_texts_table()
+        self.db.commit()
+
+    def create_texts_table(self):
+        '''
+        Create the texts table, using the best full-text index available.
+        Returns the name of the module used (or None if there's no full-text index).
+        '''
+        row = self.db.execute("SELECT sql FROM sqlite_master WHERE name = 'texts'").fetchone()
+        if row is not None:
+            for module in FTS_MODULES:
+                if 'using %s' % module in row['sql'].lower():
+                    return module
+            return None
+        for module in FTS_MODULES:
+            try:
+                self.db.execute('CREATE VIRTUAL TABLE texts USING %s (title, text)' % module)
+            except sqlite3.OperationalError:
+                continue
+            else:
+                return module
+        self.db.execute('CREATE TABLE texts (title TEXT, text TEXT)')
+        return None
+
+    def __contains__(self, article_id):
+        with self.lock:
+            row = self.db.execute('SELECT 1 FROM articles WHERE id = ?',
+                                  (to_int(article_id),)).fetchone()
+        return row is not None
+
+    def get_ids(self):
+        '''
+        Returns a set of the ids of the articles in the database (as strings).
+        '''
+        with self.lock:
+            return set([str(row[0]) for row in self.db.execute('SELECT id FROM articles')])
+
+    def write(self, article):
+        '''
+        Save an article (or a row read back from the CSV file).
+        Articles that are already in the database are replaced.
+        '''
+        values = make_row(article)
+        with self.lock:
+            self.db.execute('DELETE FROM texts WHERE rowid = ?', (values[0],))
+            self.db.execute('INSERT OR REPLACE INTO articles (%s) VALUES (%s)' %
+                            (', '.join(ARTICLE_COLUMNS), ', '.join(['?'] * len(ARTICLE_COLUMNS))),
+                            values)
+            self.db.execute('INSERT INTO texts (rowid, title, text) VALUES (?, ?, ?)',
+                            (values[0], values[1], to_unicode(article.get('text'))))
+            self.unsaved += 1
+            if self.unsaved >= self.batch_size:
+                self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.unsaved = 0
+
+    def checkpoint(self):
+        '''
+        Commit any articles waiting in the current batch.
+        '''
+        with self.lock:
+            self.commit()
+
+    def close(self):
+        with self.lock:
+            self.commit()
+            self.db.close()
+
+    def search(self, words=None, newspaper_id=None, start_date=None, end_date=None, limit=100):
+        '''
+        Find articles whose title or text match words (using the query syntax
+        of the full-text module in self.fts -- eg. 'NEAR(wragge cyclone)' for
+        FTS5, or 'wragge NEAR cyclone' for FTS4), published in the given
+        newspaper between the given dates (as YYYY-MM-DD). Returns a list of
+        rows, most relevant first.
+        '''
+        conditions = []
+        params = []
+        order = 'articles.issue_date, articles.id'
+        if words:
+            if self.fts is None:
+                conditions.append('(texts.title LIKE ? OR texts.text LIKE ?)')
+                params.extend(['%%%s%%' % words] * 2)
+            else:
+                conditions.append('texts MATCH ?')
+                params.append(words)
+                if self.fts == 'fts5':
+                    order = 'texts.rank'
+        if newspaper_id is not None:
+            conditions.append('articles.newspaper_id = ?')
+            params.append(to_int(newspaper_id))
+        if start_date:
+            conditions.append('articles.issue_date >= ?')
+            params.append(start_date)
+        if end_date:
+            conditions.append('articles.issue_date <= ?')
+            params.append(end_date)
+        query = 'SELECT articles.* FROM articles'
+        if words:
+            query += ' JOIN texts ON texts.rowid = articles.id'
+        if conditions:
+            query += ' WHERE %s' % ' AND '.join(conditions)
+        query += ' ORDER BY %s LIMIT ?' % order
+        params.append(limit)
+        with self.lock:
+            return self.db.execute(query, params).fetchall()
+
+class ParquetSink(Sink):
+    '''
+    Saves articles in a directory of Parquet files with typed columns.
+    Safe to use from multiple threads. Checkpoints don't finish the
+    current file -- that would leave lots of little files -- so any
+    articles in an unfinished file are put back from the CSV file.
+    '''
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE, rows_per_file=ROWS_PER_FILE, ftext=False):
+        if pyarrow is None:
+            raise ImportError('Saving Parquet files needs pyarrow -- pip install pyarrow')
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        self.lock = threading.Lock()
+        self.schema = make_parquet_schema(ftext)
+        self.names = [field.name for field in self.schema]
+        self.columns = dict([(name, []) for name in self.names])
+        self.rows = 0
+        self.file_rows = 0
+        self.writer = None
+        if not os.path.exists(path):
+            os.makedirs(path)
+        # Files that were never finished can't be read
+        for temp_path in glob.glob(os.path.join(path, '*.parquet' + TEMP_SUFFIX)):
+            os.remove(temp_path)
+        self.file_number = len(self.get_files())
+
+    def get_files(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def get_ids(self):
+        '''
+        Returns a set of the ids of the articles in the finished files (as strings).
+        Only the id column is read.
+        '''
+        ids = set()
+        with self.lock:
+            for path in self.get_files():
+                table = pyarrow.parquet.read_table(path, columns=['id'])
+                ids.update([str(article_id) for article_id in table.column('id').to_pylist()])
+        return ids
+
+    def write(self, article):
+        '''
+        Save an article (or a row read back from the CSV file).
+        '''
+        values = make_row(article)
+        with self.lock:
+            for name, value in zip(ARTICLE_COLUMNS, values):
+                self.columns[name].append(value)
+            self.columns['issue_date'][-1] = get_issue_date(article)
+            for name in self.names[len(ARTICLE_COLUMNS):]:
+                self.columns[name].append(to_unicode(article.get(name)))
+            self.rows += 1
+            if self.rows >= self.row_group_size:
+                self.write_row_group()
+
+    def write_row_group(self):
+        if not self.rows:
+            return
+        if self.writer is None:
+            self.file_number += 1
+            self.file_path = os.path.join(self.path, 'part-%05d.parquet' % self.file_number)
+            self.writer = pyarrow.parquet.ParquetWriter(self.file_path + TEMP_SUFFIX, self.schema)
+        arrays = [pyarrow.array(self.columns[field.name], type=field.type) for field in self.schema]
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+        self.file_rows += self.rows
+        self.columns = dict([(name, []) for name in self.names])
+        self.rows = 0
+        if self.file_rows >= self.rows_per_file:
+            self.finish_file()
+
+    def finish_file(self):
+        '''
+        Write the footer of the current file and give it its final name.
+        '''
+        if self.writer is not None:
+            self.writer.close()
+            os.rename(self.file_path + TEMP_SUFFIX, self.file_path)
+            self.writer = None
+            self.file_rows = 0
+
+    def close(self):
+        '''
+        Write any waiting articles, and finish the current file.
+        '''
+        with self.lock:
+            self.write_row_group()
+            self.finish_file()
+
+def make_parquet_schema(ftext=False):
+    '''
+    The columns of the Parquet files -- the details of articles,
+    then their texts.
+    '''
+    fields = [pyarrow.field('id', pyarrow.int64(), nullable=False),
+              pyarrow.field('title', pyarrow.string()),
+              pyarrow.field('url', pyarrow.string()),
+              pyarrow.field('newspaper_title', pyarrow.string()),
+              pyarrow.field('newspaper_details', pyarrow.string()),
+              pyarrow.field('newspaper_id', pyarrow.int32()),
+              pyarrow.field('issue_date', pyarrow.date32()),
+              pyarrow.field('page', pyarrow.int32()),
+              pyarrow.field('page_url', pyarrow.string()),
+              pyarrow.field('corrections', pyarrow.int32())]
+    if ftext:
+        fields.append(pyarrow.field('ftext', pyarrow.string()))
+    fields.append(pyarrow.field('text', pyarrow.string()))
+    return pyarrow.schema(fields)
+
+def get_issue_date(article):
+    '''
+    Returns the issue date of an article (or a CSV row) as a datetime.date,
+    or None if it doesn't have one.
+
+    >>> get_issue_date({'issue_date': 'Friday 27 October 1911'})
+    datetime.date(1911, 10, 27)
+    '''
+    try:
+        year, month, day = (article['issue_year'], article['issue_month'], article['issue_day'])
+    except KeyError:
+        try:
+            year, month, day = dates.parse_issue_date(article.get('issue_date', ''))
+        except ValueError:
+            return None
+    return datetime.date(int(year), int(month), int(day))
+
+def make_row(article):
+    '''
+    Convert the details of an article into a tuple of column values.
+    The issue date is saved as YYYY-MM-DD so it can be sorted.
+    '''
+    issue_date = get_issue_date(article)
+    if issue_date is not None:
+        issue_date = issue_date.isoformat()
+    return (to_int(article['id']),
+            to_unicode(article.get('title')),
+            to_unicode(article.get('url')),
+            to_unicode(article.get('newspaper_title')),
+            to_unicode(article.get('newspaper_details')),
+            to_int(article.get('newspaper_id')),
+            issue_date,
+            to_int(article.get('page')),
+            to_unicode(article.get('page_url')),
+            to_int(article.get('corrections')))
+
+def make_record(article, ftext=True):
+    '''
+    Convert the details of an article (or a CSV row) into a dictionary
+    of the CSV fields, with the values typed as they are by make_row.
+    Details that are missing or empty (as they are in the CSV) are None.
+
+    >>> record = make_record({'id': '13', 'issue_date': 'Friday 27 October 1911',
+    ...                       'page': '3', 'corrections': '', 'url': '', 'text': 'Rain'}, ftext=False)
+    >>> [(field, record[field]) for field in ['id', 'issue_date', 'page', 'corrections', 'url', 'page_url', 'text']]
+    [('id', 13), ('issue_date', '1911-10-27'), ('page', 3), ('corrections', None), ('url', None), ('page_url', None), ('text', u'Rain')]
+    >>> 'ftext' in record
+    False
+    '''
+    record = dict([(name, value if value != '' else None) 
+                   for name, value in zip(ARTICLE_COLUMNS, make_row(article))])
+    if ftext:
+        record['ftext'] = to_unicode(article.get('ftext', ''))
+    record['text'] = to_unicode(article.get('text', ''))
+    return record
+
+def read_csv(path):
+    '''
+    Generate the rows of a harvest's CSV file as dictionaries.
+    '''
+    with open(path, 'rb') as csv_file:
+        for row in csv.DictReader(csv_file, fieldnames=CSV_FIELDS):
+            yield row
+
+def read_jsonl(path):
+    '''
+    Generate the records in a JSON Lines file (compressed or not) as dictionaries.
+    '''
+    if path.endswith(JSONL_EXTENSIONS['gzip']):
+        jsonl_file = gzip.open(path, 'rb')
+    elif path.endswith(JSONL_EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise ImportError('Reading zstd files needs zstandard -- pip install zstandard')
+        jsonl_file = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True)
+    else:
+        jsonl_file = open(path, 'rb')
+    try:
+        rest = ''
+        while True:
+            data = jsonl_file.read(READ_SIZE)
+            if not data:
+                break
+            lines = (rest + data).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+    finally:
+        jsonl_file.close()
+
+def read_articles(path):
+    '''
+    Generate the articles saved by a harvest -- in its CSV file, JSON Lines
+    file or SQLite database -- as dictionaries of the CSV fields, with their
+    issue dates written as they are in the CSV file.
+    '''
+    if path.endswith('.db'):
+        db = sqlite3.connect(path)
+        db.row_factory = sqlite3.Row
+        try:
+            query = ('SELECT articles.*, texts.text FROM articles '
+                     'LEFT JOIN texts ON texts.rowid = articles.id')
+            for row in db.execute(query):
+                yield restore_issue_date(dict(zip(row.keys(), row)))
+        finally:
+            db.close()
+    elif [extension for extension in JSONL_EXTENSIONS.values() if path.endswith(extension)]:
+        for record in read_jsonl(path):
+            yield restore_issue_date(record)
+    else:
+        for row in read_csv(path):
+            yield row
+
+def restore_issue_date(record):
+    '''
+    Change a YYYY-MM-DD issue date back to the form used in the CSV file.
+
+    >>> restore_issue_date({'issue_date': '1911-10-27'})
+    {'issue_date': 'Friday 27 October 1911'}
+    '''
+    if record.get('issue_date'):
+        year, month, day = [int(value) for value in record['issue_date'].split('-')]
+        record['issue_date'] = dates.format_issue_date(datetime.date(year, month, day))
+    return record
+
+def read_corrections(path):
+    '''
+    Read the ids and correction counts of the articles saved by an earlier
+    harvest -- from its CSV file, JSON Lines file or SQLite database.
+    Returns a dictionary of correction counts (or None if a count is
+    unknown) keyed by article id.
+    '''
+    if path.endswith('.db'):
+        db = sqlite3.connect(path)
+        try:
+            rows = db.execute('SELECT id, corrections FROM articles').fetchall()
+        finally:
+            db.close()
+        return dict([(str(article_id), corrections) for article_id, corrections in rows])
+    if [extension for extension in JSONL_EXTENSIONS.values() if path.endswith(extension)]:
+        records = read_jsonl(path)
+    else:
+        records = read_csv(path)
+    return dict([(str(record['id']), to_int(record.get('corrections'))) for record in records])
+
+def convert_csv(path, sink):
+    '''
+    Save the articles in a harvest's CSV file that aren't already in a sink.
+    Returns the number of articles saved.
+    '''
+    saved = sink.get_ids()
+    count = 0
+    for row in read_csv(path):
+        if row['id'] not in saved:
+            sink.write(row)
+            saved.add(row['id'])
+            count += 1
+    sink.close()
+    return count
+
+def to_int(value):
+    '''
+    >>> to_int('13'), to_int(''), to_int(None), to_int(3)
+    (13, None, None, 3)
+    '''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_unicode(value):
+    '''
+    >>> to_unicode('Wragge \\xe2\\x80\\x94'), to_unicode(None)
+    (u'Wragge \\u2014', None)
+    '''
+    if isinstance(value, str):
+        return value.decode('utf-8')
+    return value
+
+def main(argv):
+    usage = 'usage: %prog database search terms\n       %prog [--parquet] [--database] csv_file'
+    parser = OptionParser(usage=usage)
+    parser.add_option('--parquet', dest='parquet', action='store_true', default=False,
+                      help='convert a CSV file to a directory of Parquet files')
+    parser.add_option('--database', dest='database', action='store_true', default=False,
+                      help='convert a CSV file to an SQLite database')
+    parser.add_option('--ftext', dest='ftext', action='store_true', default=False,
+                      help='include the text with paragraph tags in the Parquet files')
+    (options, args) = parser.parse_args(argv)
+    if options.parquet or options.database:
+        if len(args) != 1:
+            parser.error('You need to supply a CSV file.')
+        base = os.path.splitext(args[0])[0]
+        if options.parquet:
+            print 'Converted %s articles' % convert_csv(args[0], ParquetSink('%s_parquet' % base,
+                                                                              ftext=options.ftext))
+        if options.database:
+            print 'Converted %s articles' % convert_csv(args[0], SQLiteSink('%s.db' % base))
+        return
+    if len(args) < 2:
+        parser.error('You need to supply a database and some search terms.')
+    sink = SQLiteSink(args[0])
+    for row in sink.search(' '.join(args[1:])):
+        print ('%s\t%s\t%s\t%s' % (row['id'], row['issue_date'], row['newspaper_title'],
+                                   row['title'])).encode('utf-8')
+    sink.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(sys.argv[1:])
+    else:
+        import doctest
+        doctest.testmod()
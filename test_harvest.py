@@ -0,0 +1,142 @@
+'''
+test_harvest.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Checks that incremental harvests can be chained -- each update holds every
+current result, so it can be the previous harvest of the next update. The
+Trove API is replaced by a fake one, so nothing is fetched from Trove.
+
+USAGE:
+
+python test_harvest.py
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+from __future__ import with_statement
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import api
+import harvest
+import sinks
+
+QUERY = 'http://trove.nla.gov.au/newspaper/result?q=wragge'
+
+class FakeApiClient:
+    '''
+    Serves the articles in FakeApiClient.articles -- a dictionary of
+    correction counts keyed by article id -- and counts the articles fetched.
+    '''
+    articles = {}
+    fetched = []
+
+    def __init__(self, key=None, tries=10):
+        pass
+
+    def search(self, params, start=0, n=100, text=True):
+        ids = sorted(self.articles)
+        return (len(ids), [self.make_record(article_id, text) for article_id in ids[start:start + n]])
+
+    def get_article(self, article_id):
+        self.fetched.append(article_id)
+        return self.make_record(article_id, True)
+
+    def make_record(self, article_id, text):
+        record = {'id': article_id, 'heading': 'WRAGGE %s' % article_id, 'date': '1898-07-01',
+                  'title': {'id': '13', 'value': 'The Argus (Melbourne, Vic. : 1848 - 1957)'},
+                  'page': 1, 'trovePageUrl': '/ndp/del/page/1',
+                  'correctionCount': self.articles[article_id]}
+        if text:
+            record['articleText'] = '<p>Rain is coming, says Wragge (%s).</p>' % article_id
+        return record
+
+class RefreshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.api_client = api.TroveApiClient
+        api.TroveApiClient = FakeApiClient
+        FakeApiClient.articles = dict([(str(article_id), 0) for article_id in range(100, 150)])
+
+    def tearDown(self):
+        api.TroveApiClient = self.api_client
+        shutil.rmtree(self.directory)
+
+    def run_harvest(self, name, previous=None):
+        '''
+        Harvest the fake results, returning the ids of the articles fetched
+        and the path of the harvest's CSV file.
+        '''
+        FakeApiClient.fetched = []
+        filename = os.path.join(self.directory, '%s.csv' % name)
+        if previous is not None:
+            previous = os.path.join(self.directory, previous)
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            result = harvest.TroveNewspapersHarvester().harvest(QUERY, filename, backend='api',
+                                                                previous=previous, lookahead=0,
+                                                                database=True, jsonl='gzip')
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(result['status'], 'success')
+        return (sorted(FakeApiClient.fetched), filename)
+
+    def read_corrections(self, filename):
+        return sinks.read_corrections(filename)
+
+    def test_two_refreshes(self):
+        self.run_harvest('full')
+        # An article is corrected, another is added and another is gone
+        FakeApiClient.articles['110'] = 2
+        FakeApiClient.articles['150'] = 0
+        del FakeApiClient.articles['120']
+        fetched, filename = self.run_harvest('update1', 'full.csv')
+        self.assertEqual(fetched, ['110', '150'])
+        self.assertEqual(self.read_corrections(filename), FakeApiClient.articles)
+        with open(os.path.join(self.directory, 'update1_delta.txt'), 'rb') as delta:
+            self.assertEqual(sorted(delta.read().splitlines()),
+                             ['110\tcorrected\t0\t2', '120\tremoved\t0\t', '150\tnew\t\t0'])
+        # The next night only the articles changed since the first update are fetched
+        FakeApiClient.articles['110'] = 3
+        FakeApiClient.articles['130'] = 1
+        fetched, filename = self.run_harvest('update2', 'update1.csv')
+        self.assertEqual(fetched, ['110', '130'])
+        self.assertEqual(self.read_corrections(filename), FakeApiClient.articles)
+        for other in ['update2.db', 'update2.jsonl.gz']:
+            self.assertEqual(self.read_corrections(os.path.join(self.directory, other)),
+                             FakeApiClient.articles)
+        # Nothing has changed, so nothing is fetched -- from the JSON Lines file or the database
+        for previous in ['update2.jsonl.gz', 'update2.db']:
+            fetched, filename = self.run_harvest('update3-%s' % previous.split('.')[1], previous)
+            self.assertEqual(fetched, [])
+            self.assertEqual(self.read_corrections(filename), FakeApiClient.articles)
+            articles = list(sinks.read_articles(filename))
+            self.assertEqual(articles[0]['issue_date'], 'Friday 1 July 1898')
+            self.assertTrue(articles[0]['text'].startswith('Rain is coming'))
+
+    def test_previous_is_output(self):
+        self.run_harvest('full')
+        self.assertRaises(ValueError, self.run_harvest, 'full', 'full.csv')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,12 +12,15 @@ except ImportError:
 import pickle
 import urllib
 from urllib2 import Request, urlopen, URLError, HTTPError
-import time
 import os
 import calendar
 import datetime
 import string
 
+import dates
+import fetch
+import retry
+
 YAHOO_ID = 'JAp9z33V34HzR4rvRaHUNsRuEadGdaoQlRWYwsObAM1YquTZ.m92jjrhx.X0mOro67op'
 YAHOO_URL = 'http://wherein.yahooapis.com/v1/document'
 
@@ -73,33 +76,24 @@ def get_titles(locate=False):
                                })
     return titles            
             
-def get_url(url, try_num=0):
+def get_url(url, tries=10):
     '''
-    Retrieve page.
+    Retrieve page using the shared keep-alive session, retrying
+    server (5xx) errors according to the shared retry policy.
     '''
-    if try_num < 10:
-        user_agent = 'Mozilla/5.0 (X11; Linux i686; rv:2.0.1) Gecko/20100101 Firefox/4.0.1'
-        headers = { 'User-Agent' : user_agent }
-        req = Request(url, None, headers)
-        try:
-            response = urlopen(req)
-        except HTTPError, error:
-            if error.code >= 500:
-                time.sleep(10)
-                get_url(url, try_num =+ 1)
-            elif error.code == 404:
-                print 'Not there'
-                raise
-            else:
-                print 'The server couldn\'t fulfill the request.'
-                print 'Error code: ', error.code
-        except URLError, error:
-            print 'We failed to reach a server.'
-            print 'Reason: ', error.reason
+    try:
+        return retry.RetryPolicy(tries=tries).call(fetch.get_url, url)
+    except HTTPError, error:
+        if error.code == 404:
+            print 'Not there'
         else:
-            return response
-    else:
-        raise HTTPError
+            print 'The server couldn\'t fulfill the request.'
+            print 'Error code: ', error.code
+        raise
+    except URLError, error:
+        print 'We failed to reach a server.'
+        print 'Reason: ', error.reason
+        raise
 
 def save_titles(path=None):
     '''
@@ -142,10 +136,7 @@ def parse_date(date):
     '''
     Parses dates from Trove of the form Friday 27 October 1911.
     '''
-    months = dict((v,k) for k,v in enumerate(calendar.month_name))
-    day, month, year = re.findall('\w+ (\d{1,2}) (\w+) (\d{4})', date)[0]
-    month_num = months[month]
-    return datetime.date(int(year), month_num, int(day))
+    return dates.parse_date(date)
     
 def format_date(date):
     '''
@@ -0,0 +1,143 @@
+'''
+workers.py
+Created on 18/10/2026
+@author: Tim Sherratt (tim@discontents.com.au)
+
+Provides a bounded pool of worker threads for running fetches concurrently
+while keeping the results in their original order.
+
+USAGE:
+
+outcomes = workers.ordered_map(get_article_details, ids, workers=4)
+for article, error in outcomes:
+    ...
+
+Or keep a pool of threads running and submit calls as they come up:
+pool = workers.WorkerPool(4)
+future = pool.submit(get_article_details, '12324423')
+article = future.result()
+pool.close()
+
+Copyright (C) 2011 Tim Sherratt
+This file is part of the TroveNewspapers package.
+
+The TroveNewspapers package is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+The TroveNewspapers package is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with the TroveNewspapers package. If not, see <http://www.gnu.org/licenses/>.
+'''
+import threading
+import Queue
+
+def call(func, item):
+    '''
+    Call func, returning a (result, error) tuple rather than raising.
+    '''
+    try:
+        return (func(item), None)
+    except Exception, error:
+        return (None, error)
+
+def ordered_map(func, items, workers=1):
+    '''
+    Apply func to each item using up to the given number of worker threads.
+    Returns a list of (result, error) tuples in the same order as items.
+    '''
+    items = list(items)
+    outcomes = [None] * len(items)
+    if workers <= 1 or len(items) <= 1:
+        for index, item in enumerate(items):
+            outcomes[index] = call(func, item)
+        return outcomes
+    tasks = Queue.Queue()
+    for index, item in enumerate(items):
+        tasks.put((index, item))
+    def work():
+        while True:
+            try:
+                index, item = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            outcomes[index] = call(func, item)
+    threads = [threading.Thread(target=work) for num in range(min(workers, len(items)))]
+    for thread in threads:
+        thread.setDaemon(True)
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+class Future:
+    '''
+    The outcome of a call submitted to a WorkerPool.
+    '''
+    def __init__(self):
+        self.finished = threading.Event()
+        self.outcome = (None, None)
+
+    def set_outcome(self, outcome):
+        self.outcome = outcome
+        self.finished.set()
+
+    def done(self):
+        return self.finished.isSet()
+
+    def wait(self):
+        '''
+        Wait for the call to finish, returning a (result, error) tuple.
+        '''
+        self.finished.wait()
+        return self.outcome
+
+    def result(self):
+        '''
+        Wait for the call to finish, returning its result or raising its error.
+        '''
+        result, error = self.wait()
+        if error is not None:
+            raise error
+        return result
+
+class WorkerPool:
+    '''
+    A fixed number of worker threads that run submitted calls in turn.
+    '''
+    def __init__(self, workers=4):
+        self.tasks = Queue.Queue()
+        self.threads = [threading.Thread(target=self.work) for num in range(max(workers, 1))]
+        for thread in self.threads:
+            thread.setDaemon(True)
+            thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        Queue a call to func, returning a Future for its outcome.
+        '''
+        future = Future()
+        self.tasks.put((future, func, args, kwargs))
+        return future
+
+    def work(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                return
+            future, func, args, kwargs = task
+            future.set_outcome(call(lambda args: func(*args, **kwargs), args))
+
+    def close(self):
+        '''
+        Finish the calls already submitted, then stop the workers.
+        '''
+        for thread in self.threads:
+            self.tasks.put(None)
+        for thread in self.threads:
+            thread.join()